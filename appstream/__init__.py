@@ -19,6 +19,8 @@
 # MA 02110-1301, USA
 
 from appstream.store import Store
+from appstream.mapped import MappedStore
+from appstream.gzindex import IndexedStore
 from appstream.component import Component
 from appstream.component import Checksum
 from appstream.component import Provide
@@ -27,4 +29,5 @@ from appstream.component import Release
 from appstream.component import Require
 from appstream.component import Review
 from appstream.component import Screenshot
+from appstream.requirements import RequirementEvaluator
 from appstream.errors import ParseError, ValidationError
@@ -0,0 +1,132 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+import hashlib
+import os
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# bump this when the layout of any of the model objects changes
+_CACHE_VERSION = 1
+
+def _cache_filename(cache_dir, filename):
+    """ Returns the cache image filename for a source file """
+    key = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, key + '.cache')
+
+def _file_digest(filename):
+    """ Returns the SHA-256 hash of a file """
+    csum = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        while True:
+            data = f.read(1024 * 1024)
+            if not data:
+                break
+            csum.update(data)
+    return csum.hexdigest()
+
+def _header(filename):
+    """ Returns the values used to check a cache image is still valid """
+    st = os.stat(filename)
+    return {
+        'version': _CACHE_VERSION,
+        'filename': os.path.abspath(filename),
+        'mtime': st.st_mtime,
+        'size': st.st_size,
+    }
+
+def load(filename, cache_dir):
+    """ Returns the cached state of a store for a source file, or None
+
+    The cached image is used if the source file has the same size and mtime
+    as when the image was written, or failing that, the same content hash,
+    in which case the image is updated with the new size and mtime so the
+    file does not have to be hashed again next time.
+    Only use a cache directory that cannot be written by untrusted users.
+    """
+    try:
+        f = open(_cache_filename(cache_dir, filename), 'rb')
+    except (IOError, OSError):
+        return None
+    try:
+        try:
+            cached = pickle.load(f)
+            current = _header(filename)
+            for key in ['version', 'filename']:
+                if cached[key] != current[key]:
+                    return None
+            stale = False
+            if cached['mtime'] != current['mtime'] or cached['size'] != current['size']:
+                if cached['digest'] != _file_digest(filename):
+                    return None
+                stale = True
+            state = pickle.load(f)
+        except Exception:
+            # a truncated or incompatible image is just a cache miss
+            return None
+    finally:
+        f.close()
+    if stale:
+        current['digest'] = cached['digest']
+        try:
+            _write(filename, cache_dir, current, state)
+        except (IOError, OSError):
+            # the image is still valid, just slower to check
+            pass
+    return state
+
+def _write(filename, cache_dir, header, state):
+    """ Writes a cache image with a header from _header() """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    # write to a temporary file so readers never see a partial image
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, _cache_filename(cache_dir, filename))
+    except:
+        os.unlink(tmp)
+        raise
+
+def header(filename):
+    """ Returns the header for a cache image of a source file
+
+    Call this before parsing the file, so that if the file is replaced
+    while it is being parsed the image is for the old file and is not used.
+    """
+    value = _header(filename)
+    value['digest'] = _file_digest(filename)
+    return value
+
+def save(filename, cache_dir, state, value=None):
+    """ Saves the state of a store parsed from a source file
+
+    The value is from header(), taken before the file was parsed.
+    """
+    if value is None:
+        value = header(filename)
+    _write(filename, cache_dir, value, state)
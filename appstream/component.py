@@ -18,20 +18,14 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 # MA 02110-1301, USA
 
+import hashlib
+import json
 import sys
-import xml.etree.ElementTree as ET
-import dateutil.parser
-from datetime import datetime
-
-try:
-    # Py2.7 and newer
-    from xml.etree.ElementTree import ParseError as StdlibParseError
-except ImportError:
-    # Py2.6 and older
-    from xml.parsers.expat import ExpatError as StdlibParseError
+import time
 
+from appstream import etree
 from appstream.errors import ParseError, ValidationError
-from appstream.utils import _join_lines, _parse_desc
+from appstream.utils import _canonical, _intern, _join_lines, _parse_date, _parse_desc, _parse_int, _version_key, _TRANSIENT_SLOTS
 
 if sys.version_info[0] == 2:
     # Python2 has a nice basestring base class
@@ -40,26 +34,97 @@ else:
     # But python3 has distinct types
     string_types = (str, bytes)
 
+def _getstate(obj):
+    """ Returns the state of a model object without back-references or caches """
+    return dict([(s, getattr(obj, s)) for s in obj.__slots__
+                 if s not in _TRANSIENT_SLOTS])
+
+def _setstate(obj, state):
+    """ Restores the state from _getstate() """
+    for s in obj.__slots__:
+        if s in _TRANSIENT_SLOTS:
+            setattr(obj, s, None)
+    for key in state:
+        setattr(obj, key, state[key])
+
+# children of <component> that hold lists of simple elements
+_LIST_TAGS = ('kudos', 'keywords', 'categories', 'custom')
+
+# the Component attribute set from each child of <component>
+_TAG_FIELDS = {
+    'id': 'id',
+    'updatecontact': 'update_contact',
+    'update_contact': 'update_contact',
+    'metadata_license': 'metadata_license',
+    'project_license': 'project_license',
+    'licence': 'project_license',
+    'developer_name': 'developer_name',
+    'name': 'name',
+    'pkgname': 'pkgname',
+    'summary': 'summary',
+    'description': 'description',
+    'url': 'urls',
+    'icon': 'icons',
+    'releases': 'releases',
+    'reviews': 'reviews',
+    'screenshots': 'screenshots',
+    'provides': 'provides',
+    'requires': 'requires',
+    'kudos': 'kudos',
+    'keywords': 'keywords',
+    'categories': 'categories',
+    'custom': 'custom',
+}
+
+# every field that can be used in a projection
+_FIELDS = frozenset(list(_TAG_FIELDS.values()) + ['kind'])
+
+def _check_fields(fields):
+    """ Returns the fields of a projection as a set, or None for all """
+    if fields is None:
+        return None
+    fields = frozenset(fields)
+    for field in fields - _FIELDS:
+        raise ValueError('Unknown field %s' % field)
+    return fields | frozenset(['id'])
+
 class Checksum(object):
+    __slots__ = ('kind', 'target', 'value', 'filename')
+
     def __init__(self):
         """ Set defaults """
         self.kind = 'sha1'
         self.target = None
         self.value = None
         self.filename = None
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
     def to_xml(self):
         return '        <checksum filename="%s" target="%s" type="sha1">%s</checksum>\n' % (self.filename, self.target, self.value)
     def _parse_tree(self, node):
         """ Parse a <checksum> object """
-        if 'filename' in node.attrib:
-            self.filename = node.attrib['filename']
-        if 'type' in node.attrib:
-            self.kind = node.attrib['type']
-        if 'target' in node.attrib:
-            self.target = node.attrib['target']
-        self.value = node.text
+        self._parse_element(node.attrib, node.text)
+
+    def _parse_element(self, attrib, text):
+        """ Parse the attributes and text of a <checksum> element """
+        if 'filename' in attrib:
+            self.filename = attrib['filename']
+        if 'type' in attrib:
+            self.kind = _intern(attrib['type'])
+        if 'target' in attrib:
+            self.target = _intern(attrib['target'])
+        self.value = text
 
 class Review(object):
+    __slots__ = ('id', 'summary', 'description', 'locale', 'karma', 'score',
+                 'rating', 'version', 'reviewer_id', 'reviewer_name', 'date',
+                 'metadata')
+
     def __init__(self):
         """ Set defaults """
         self.id = None
@@ -75,72 +140,92 @@ class Review(object):
         self.date = None
         self.metadata = {}
 
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
     def _parse_tree(self, node):
         """ Parse a <review> object """
-        if 'date' in node.attrib:
-            dt = dateutil.parser.parse(node.attrib['date'])
-            self.date = int(dt.strftime("%s"))
-        if 'id' in node.attrib:
-            self.id = node.attrib['id']
-        if 'karma' in node.attrib:
-            self.karma = int(node.attrib['karma'])
-        if 'score' in node.attrib:
-            self.score = int(node.attrib['score'])
-        if 'rating' in node.attrib:
-            self.rating = int(node.attrib['rating'])
+        self._parse_attrib(node.attrib)
         for c3 in node:
-            if c3.tag == 'lang':
-                self.locale = c3.text
-            if c3.tag == 'version':
-                self.version = c3.text
-            if c3.tag == 'reviewer_id':
-                self.reviewer_id = c3.text
-            if c3.tag == 'reviewer_name':
-                self.reviewer_name = c3.text
-            if c3.tag == 'summary':
-                self.summary = c3.text
             if c3.tag == 'description':
                 self.description = _parse_desc(c3)
-            if c3.tag == 'metadata':
+            elif c3.tag == 'metadata':
                 for c4 in c3:
-                    if c4.tag == 'value':
-                        if 'key' in c4.attrib:
-                            self.metadata[c4.attrib['key']] = c4.text
+                    self._parse_metadata(c4.tag, c4.attrib, c4.text)
+            else:
+                self._parse_child(c3.tag, c3.attrib, c3.text)
+
+    def _parse_attrib(self, attrib):
+        """ Parse the attributes of a <review> element """
+        if 'date' in attrib:
+            self.date = _parse_date(attrib['date'])
+        if 'id' in attrib:
+            self.id = attrib['id']
+        if 'karma' in attrib:
+            self.karma = _parse_int(attrib['karma'])
+        if 'score' in attrib:
+            self.score = _parse_int(attrib['score'])
+        if 'rating' in attrib:
+            self.rating = _parse_int(attrib['rating'])
+
+    def _parse_child(self, tag, attrib, text):
+        """ Parse a text child element of <review> """
+        if tag == 'lang':
+            self.locale = text
+        elif tag == 'version':
+            self.version = text
+        elif tag == 'reviewer_id':
+            self.reviewer_id = text
+        elif tag == 'reviewer_name':
+            self.reviewer_name = text
+        elif tag == 'summary':
+            self.summary = text
+
+    def _parse_metadata(self, tag, attrib, text):
+        """ Parse a child element of <metadata> """
+        if tag == 'value' and 'key' in attrib:
+            self.metadata[attrib['key']] = text
 
     def to_xml(self):
-        xml = '      <review'
+        xml = ['      <review']
         if self.date:
-            xml += ' date="%s"' % datetime.fromtimestamp(self.date).isoformat()
+            xml.append(' date="%s"' % time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(self.date)))
         if self.rating:
-            xml += ' rating="%s"' % self.rating
+            xml.append(' rating="%s"' % self.rating)
         if self.score:
-            xml += ' score="%i"' % self.score
+            xml.append(' score="%i"' % self.score)
         if self.karma:
-            xml += ' karma="%s"' % self.karma
+            xml.append(' karma="%s"' % self.karma)
         if self.id:
-            xml += ' id="%s"' % self.id
-        xml += '>\n'
+            xml.append(' id="%s"' % self.id)
+        xml.append('>\n')
         if self.summary:
-            xml += '        <summary>%s</summary>\n' % self.summary
+            xml.append('        <summary>%s</summary>\n' % self.summary)
         if self.description:
-            xml += '        <description>%s</description>\n' % self.description
+            xml.append('        <description>%s</description>\n' % self.description)
         if self.version:
-            xml += '        <version>%s</version>\n' % self.version
+            xml.append('        <version>%s</version>\n' % self.version)
         if self.reviewer_id:
-            xml += '        <reviewer_id>%s</reviewer_id>\n' % self.reviewer_id
+            xml.append('        <reviewer_id>%s</reviewer_id>\n' % self.reviewer_id)
         if self.reviewer_name:
-            xml += '        <reviewer_name>%s</reviewer_name>\n' % self.reviewer_name
+            xml.append('        <reviewer_name>%s</reviewer_name>\n' % self.reviewer_name)
         if self.locale:
-            xml += '        <lang>%s</lang>\n' % self.locale
+            xml.append('        <lang>%s</lang>\n' % self.locale)
         if len(self.metadata) > 0:
-            xml += '        <metadata>\n'
+            xml.append('        <metadata>\n')
             for key in self.metadata:
-                xml += '          <value key=\"%s\">%s</value>\n' % (key, self.metadata[key])
-            xml += '        </metadata>\n'
-        xml += '      </review>\n'
-        return xml
+                xml.append('          <value key=\"%s\">%s</value>\n' % (key, self.metadata[key]))
+            xml.append('        </metadata>\n')
+        xml.append('      </review>\n')
+        return ''.join(xml)
 
 class Release(object):
+    __slots__ = ('version', 'description', 'timestamp', 'checksums', 'location',
+                 'size_installed', 'size_download', 'urgency', '_parent')
+
     def __init__(self):
         """ Set defaults """
         self.version = None
@@ -151,6 +236,13 @@ class Release(object):
         self.size_installed = 0
         self.size_download = 0
         self.urgency = None
+        self._parent = None
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
 
     def get_checksum_by_target(self, target):
         """ returns a checksum of a specific kind """
@@ -166,59 +258,174 @@ class Release(object):
                 self.checksums.remove(csum_tmp)
                 break
         self.checksums.append(csum)
+        if self._parent:
+            self._parent.invalidate()
 
     def _parse_tree(self, node):
         """ Parse a <release> object """
-        if 'timestamp' in node.attrib:
-            self.timestamp = int(node.attrib['timestamp'])
-        if 'date' in node.attrib:
-            dt = dateutil.parser.parse(node.attrib['date'])
-            self.timestamp = int(dt.strftime("%s"))
-        if 'urgency' in node.attrib:
-            self.urgency = node.attrib['urgency']
-        if 'version' in node.attrib:
-            self.version = node.attrib['version']
-            # fix up hex value
-            if self.version.startswith('0x'):
-                self.version = str(int(self.version[2:], 16))
+        self._parse_attrib(node.attrib)
         for c3 in node:
             if c3.tag == 'description':
                 self.description = _parse_desc(c3)
-            if c3.tag == 'size':
-                if 'type' not in c3.attrib:
-                    continue
-                if c3.attrib['type'] == 'installed':
-                    self.size_installed = int(c3.text)
-                if c3.attrib['type'] == 'download':
-                    self.size_download = int(c3.text)
             elif c3.tag == 'checksum':
                 csum = Checksum()
                 csum._parse_tree(c3)
                 self.add_checksum(csum)
+            else:
+                self._parse_child(c3.tag, c3.attrib, c3.text)
+
+    def _parse_attrib(self, attrib):
+        """ Parse the attributes of a <release> element """
+        if 'timestamp' in attrib:
+            self.timestamp = _parse_int(attrib['timestamp'])
+        if 'date' in attrib:
+            self.timestamp = _parse_date(attrib['date'])
+        if 'urgency' in attrib:
+            self.urgency = _intern(attrib['urgency'])
+        if 'version' in attrib:
+            self.version = attrib['version']
+            # fix up hex value
+            if self.version.startswith('0x'):
+                self.version = str(_parse_int(self.version[2:], 16))
+
+    def _parse_child(self, tag, attrib, text):
+        """ Parse a text child element of <release> """
+        if tag == 'size':
+            if 'type' not in attrib:
+                return
+            if attrib['type'] == 'installed':
+                self.size_installed = _parse_int(text)
+            if attrib['type'] == 'download':
+                self.size_download = _parse_int(text)
 
     def to_xml(self):
-        xml = '      <release'
+        xml = ['      <release']
         if self.version:
-            xml += ' version="%s"' % self.version
+            xml.append(' version="%s"' % self.version)
         if self.timestamp:
-            xml += ' timestamp="%i"' % self.timestamp
+            xml.append(' timestamp="%i"' % self.timestamp)
         if self.urgency:
-            xml += ' urgency="%s"' % self.urgency
-        xml += '>\n'
+            xml.append(' urgency="%s"' % self.urgency)
+        xml.append('>\n')
         if self.size_installed > 0:
-            xml += '        <size type="installed">%i</size>\n' % self.size_installed
+            xml.append('        <size type="installed">%i</size>\n' % self.size_installed)
         if self.size_download > 0:
-            xml += '        <size type="download">%i</size>\n' % self.size_download
+            xml.append('        <size type="download">%i</size>\n' % self.size_download)
         if self.location:
-            xml += '        <location>%s</location>\n' % self.location
+            xml.append('        <location>%s</location>\n' % self.location)
         for csum in self.checksums:
-            xml += csum.to_xml()
+            xml.append(csum.to_xml())
         if self.description:
-            xml += '        <description>%s</description>\n' % self.description
-        xml += '      </release>\n'
-        return xml
+            xml.append('        <description>%s</description>\n' % self.description)
+        xml.append('      </release>\n')
+        return ''.join(xml)
+
+class ReleaseList(list):
+    """ A list of releases ordered newest first, with unique versions
+
+    Releases are keyed on the version they had when added, so the version
+    of a release should not be changed while it is in the list. If the list
+    belongs to a component, adding or removing releases sets their parent
+    and drops the cached XML and hash of the component.
+    """
+    __slots__ = ('_by_version', '_keys', '_parent')
+
+    def __init__(self, releases=(), parent=None):
+        list.__init__(self)
+        self._by_version = {}
+        self._keys = []
+        self._parent = parent
+        self.extend(releases)
+
+    def _detach(self, releases):
+        """ Clear the parent of releases that are no longer in the list """
+        for release in releases:
+            if release._parent is self._parent and \
+                    self._by_version.get(release.version) is not release:
+                release._parent = None
+        if self._parent:
+            self._parent.invalidate()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def get_by_version(self, version):
+        """ Returns the release with a specific version """
+        return self._by_version.get(version)
+
+    def append(self, release):
+        """ Add a release in version order if the version does not already exist """
+        if release.version in self._by_version:
+            return
+        key = _version_key(release.version)
+
+        # binary search, as the keys are in descending order
+        lo = 0
+        hi = len(self._keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._keys[mid] >= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        self._keys.insert(lo, key)
+        list.insert(self, lo, release)
+        self._by_version[release.version] = release
+        if self._parent:
+            release._parent = self._parent
+            self._parent.invalidate()
+
+    def insert(self, index, release):
+        """ Add a release; the index is ignored as the list is kept sorted """
+        self.append(release)
+
+    def extend(self, releases):
+        for release in releases:
+            self.append(release)
+
+    def __iadd__(self, releases):
+        self.extend(releases)
+        return self
+
+    def remove(self, release):
+        self.pop(self.index(release))
+
+    def pop(self, index=-1):
+        release = list.pop(self, index)
+        self._keys.pop(index)
+        del self._by_version[release.version]
+        self._detach([release])
+        return release
+
+    def _rebuild(self):
+        """ Re-sort after the list has been modified directly """
+        releases = list(self)
+        list.__delitem__(self, slice(None))
+        self._by_version = {}
+        self._keys = []
+        self.extend(releases)
+
+    def __delitem__(self, index):
+        releases = list(self)
+        list.__delitem__(self, index)
+        self._rebuild()
+        self._detach(releases)
+
+    def __setitem__(self, index, value):
+        releases = list(self)
+        list.__setitem__(self, index, value)
+        self._rebuild()
+        self._detach(releases)
+
+    def sort(self, *args, **kwargs):
+        self._rebuild()
+
+    def reverse(self):
+        self._rebuild()
 
 class Image(object):
+    __slots__ = ('kind', 'width', 'height', 'url')
+
     def __init__(self):
         """ Set defaults """
         self.kind = None
@@ -226,36 +433,55 @@ class Image(object):
         self.height = 0
         self.url = None
 
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
     def to_xml(self):
-        xml = '        <image'
+        xml = ['        <image']
         if self.kind:
-            xml += ' type="%s"' % self.kind
+            xml.append(' type="%s"' % self.kind)
         if self.width > 0:
-            xml += ' width="%i"' % self.width
+            xml.append(' width="%i"' % self.width)
         if self.height > 0:
-            xml += ' height="%i"' % self.height
-        xml += '>'
+            xml.append(' height="%i"' % self.height)
+        xml.append('>')
         if self.url:
-            xml += self.url
-        xml += '</image>\n'
-        return xml
+            xml.append(self.url)
+        xml.append('</image>\n')
+        return ''.join(xml)
 
     def _parse_tree(self, node):
         """ Parse a <image> object """
-        if 'type' in node.attrib:
-            self.kind = node.attrib['type']
-        if 'width' in node.attrib:
-            self.width = int(node.attrib['width'])
-        if 'height' in node.attrib:
-            self.height = int(node.attrib['height'])
-        self.url = node.text
+        self._parse_element(node.attrib, node.text)
+
+    def _parse_element(self, attrib, text):
+        """ Parse the attributes and text of an <image> element """
+        if 'type' in attrib:
+            self.kind = _intern(attrib['type'])
+        if 'width' in attrib:
+            self.width = _parse_int(attrib['width'])
+        if 'height' in attrib:
+            self.height = _parse_int(attrib['height'])
+        self.url = text
 
 class Screenshot(object):
+    __slots__ = ('kind', 'caption', 'images', '_parent')
+
     def __init__(self):
         """ Set defaults """
         self.kind = None
         self.caption = None
         self.images = []
+        self._parent = None
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
 
     def get_image_by_kind(self, kind):
         """ returns a image of a specific kind """
@@ -271,11 +497,12 @@ class Screenshot(object):
                 self.images.remove(im_tmp)
                 break
         self.images.append(im)
+        if self._parent:
+            self._parent.invalidate()
 
     def _parse_tree(self, node):
         """ Parse a <screenshot> object """
-        if 'type' in node.attrib:
-            self.kind = node.attrib['type']
+        self._parse_attrib(node.attrib)
         for c3 in node:
             if c3.tag == 'caption':
                 self.caption = _parse_desc(c3)
@@ -284,48 +511,86 @@ class Screenshot(object):
                 im._parse_tree(c3)
                 self.add_image(im)
 
+    def _parse_attrib(self, attrib):
+        """ Parse the attributes of a <screenshot> element """
+        if 'type' in attrib:
+            self.kind = _intern(attrib['type'])
+
     def to_xml(self):
-        xml = '      <screenshot'
+        xml = ['      <screenshot']
         if self.kind:
-            xml += ' type="%s"' % self.kind
-        xml += '>\n'
+            xml.append(' type="%s"' % self.kind)
+        xml.append('>\n')
         for im in self.images:
-            xml += im.to_xml()
+            xml.append(im.to_xml())
         if self.caption:
-            xml += '        <caption>%s</caption>\n' % self.caption
-        xml += '      </screenshot>\n'
-        return xml
+            xml.append('        <caption>%s</caption>\n' % self.caption)
+        xml.append('      </screenshot>\n')
+        return ''.join(xml)
 
 class Provide(object):
+    __slots__ = ('kind', 'value')
+
     def __init__(self):
         """ Set defaults """
         self.kind = None
         self.value = None
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
     def _parse_tree(self, node):
         """ Parse a <provide> object """
-        if node.tag == 'firmware':
-            if 'type' in node.attrib and node.attrib['type'] == 'flashed':
+        self._parse_element(node.tag, node.attrib, node.text)
+
+    def _parse_element(self, tag, attrib, text):
+        """ Parse the tag, attributes and text of a child of <provides> """
+        if tag == 'firmware':
+            if 'type' in attrib and attrib['type'] == 'flashed':
                 self.kind = 'firmware-flashed'
-            self.value = node.text.lower()
+            if text is None:
+                raise ParseError('Expected a GUID in <firmware>')
+            self.value = text.lower()
 
 class Require(object):
+    __slots__ = ('kind', 'compare', 'version', 'value')
+
     def __init__(self):
         """ Set defaults """
         self.kind = None
         self.compare = None
         self.version = None
         self.value = None
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
     def _parse_tree(self, node):
         """ Parse a <require> object """
-        self.kind = node.tag
-        if 'compare' in node.attrib:
-            self.compare = node.attrib['compare']
-        if 'version' in node.attrib:
-            self.version = node.attrib['version']
-        self.value = node.text
+        self._parse_element(node.tag, node.attrib, node.text)
+
+    def _parse_element(self, tag, attrib, text):
+        """ Parse the tag, attributes and text of a child of <requires> """
+        self.kind = _intern(tag)
+        if 'compare' in attrib:
+            self.compare = _intern(attrib['compare'])
+        if 'version' in attrib:
+            self.version = attrib['version']
+        self.value = text
 
 class Component(object):
     """ A quick'n'dirty MetaInfo parser """
+    __slots__ = ('id', 'update_contact', 'kind', 'provides', 'requires', 'name',
+                 'pkgname', 'summary', 'description', 'urls', 'icons',
+                 'metadata_license', 'project_license', 'developer_name',
+                 '_releases', 'reviews', 'screenshots', 'kudos', 'keywords',
+                 'categories', 'custom', '_xml', '_hash')
 
     def __init__(self):
         """ Set defaults """
@@ -343,98 +608,160 @@ class Component(object):
         self.metadata_license = None
         self.project_license = None
         self.developer_name = None
-        self.releases = []
+        self._releases = ReleaseList(parent=self)
         self.reviews = []
         self.screenshots = []
         self.kudos = []
         self.keywords = []
         self.categories = []
         self.custom = {}
+        self._xml = None
+        self._hash = None
+
+    def __getstate__(self):
+        return _getstate(self)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+        self._releases._parent = self
+        for rel in self._releases:
+            rel._parent = self
+        for ss in self.screenshots:
+            ss._parent = self
+
+    def invalidate(self):
+        """ Drop the cached XML and hash after the component has been changed
+
+        This is done automatically by the add_* methods and when releases
+        are added to or removed from the releases list, but has to be called
+        manually after setting any other attribute of the component or of
+        its releases, screenshots, checksums and images, or after changing
+        any other list or dict in place.
+        """
+        self._xml = None
+        self._hash = None
+
+    def get_hash(self):
+        """ Returns a stable hash of the component content, e.g. for an ETag """
+        if self._hash is None:
+            # JSON gives the same text for str and unicode on Python 2,
+            # unlike repr()
+            data = json.dumps(_canonical(self), sort_keys=True,
+                              separators=(',', ':')).encode('utf-8')
+            self._hash = hashlib.sha1(data).hexdigest()
+        return self._hash
 
     def to_xml(self):
-        xml = '  <component type="firmware">\n'
+        if self._xml is None:
+            self._xml = self._to_xml()
+        return self._xml
+
+    def _to_xml(self):
+        xml = ['  <component type="firmware">\n']
         if self.id:
-            xml += '    <id>%s</id>\n' % self.id
+            xml.append('    <id>%s</id>\n' % self.id)
         if self.pkgname:
-            xml += '    <pkgname>%s</pkgname>\n' % self.pkgname
+            xml.append('    <pkgname>%s</pkgname>\n' % self.pkgname)
         if self.name:
-            xml += '    <name>%s</name>\n' % self.name
+            xml.append('    <name>%s</name>\n' % self.name)
         if self.summary:
-            xml += '    <summary>%s</summary>\n' % self.summary
+            xml.append('    <summary>%s</summary>\n' % self.summary)
         if self.developer_name:
-            xml += '    <developer_name>%s</developer_name>\n' % self.developer_name
+            xml.append('    <developer_name>%s</developer_name>\n' % self.developer_name)
         if self.project_license:
-            xml += '    <project_license>%s</project_license>\n' % self.project_license
+            xml.append('    <project_license>%s</project_license>\n' % self.project_license)
         if self.description:
-            xml += '    <description>%s</description>\n' % self.description
+            xml.append('    <description>%s</description>\n' % self.description)
         for key in self.urls:
-            xml += '    <url type="%s">%s</url>\n' % (key, self.urls[key])
+            xml.append('    <url type="%s">%s</url>\n' % (key, self.urls[key]))
         for key in self.icons:
-            xml += '    <icon type="%s">%s</icon>\n' % (key, self.icons[key]['value'])
+            xml.append('    <icon type="%s">%s</icon>\n' % (key, self.icons[key]['value']))
         if len(self.releases) > 0:
-            xml += '    <releases>\n'
+            xml.append('    <releases>\n')
             for rel in self.releases:
-                xml += rel.to_xml()
-            xml += '    </releases>\n'
+                xml.append(rel.to_xml())
+            xml.append('    </releases>\n')
         if len(self.reviews) > 0:
-            xml += '    <reviews>\n'
+            xml.append('    <reviews>\n')
             for rel in self.reviews:
-                xml += rel.to_xml()
-            xml += '    </reviews>\n'
+                xml.append(rel.to_xml())
+            xml.append('    </reviews>\n')
         if len(self.screenshots) > 0:
-            xml += '    <screenshots>\n'
+            xml.append('    <screenshots>\n')
             for rel in self.screenshots:
-                xml += rel.to_xml()
-            xml += '    </screenshots>\n'
+                xml.append(rel.to_xml())
+            xml.append('    </screenshots>\n')
         if len(self.kudos) > 0:
-            xml += '    <kudos>\n'
+            xml.append('    <kudos>\n')
             for kudo in self.kudos:
-                xml += '      <kudo>%s</kudo>\n' % kudo
-            xml += '    </kudos>\n'
+                xml.append('      <kudo>%s</kudo>\n' % kudo)
+            xml.append('    </kudos>\n')
         if len(self.keywords) > 0:
-            xml += '    <keywords>\n'
+            xml.append('    <keywords>\n')
             for keyword in self.keywords:
-                xml += '      <keyword>%s</keyword>\n' % keyword
-            xml += '    </keywords>\n'
+                xml.append('      <keyword>%s</keyword>\n' % keyword)
+            xml.append('    </keywords>\n')
         if len(self.categories) > 0:
-            xml += '    <categories>\n'
+            xml.append('    <categories>\n')
             for category in self.categories:
-                xml += '      <category>%s</category>\n' % category
-            xml += '    </categories>\n'
+                xml.append('      <category>%s</category>\n' % category)
+            xml.append('    </categories>\n')
         if len(self.provides) > 0:
-            xml += '    <provides>\n'
+            xml.append('    <provides>\n')
             for p in self.provides:
-                xml += '      <firmware type="flashed">%s</firmware>\n' % p.value
-            xml += '    </provides>\n'
+                xml.append('      <firmware type="flashed">%s</firmware>\n' % p.value)
+            xml.append('    </provides>\n')
         if len(self.requires) > 0:
-            xml += '    <requires>\n'
+            xml.append('    <requires>\n')
             for p in self.requires:
                 if not p.kind:
                     continue
-                xml += '      <%s' % p.kind
+                xml.append('      <%s' % p.kind)
                 if p.compare:
-                    xml += ' compare="%s"' % p.compare
+                    xml.append(' compare="%s"' % p.compare)
                 if p.version:
-                    xml += ' version="%s"' % p.version
-                xml += '>'
+                    xml.append(' version="%s"' % p.version)
+                xml.append('>')
                 if p.value:
-                    xml += p.value
-                xml += '</%s>\n' % p.kind
-            xml += '    </requires>\n'
+                    xml.append(p.value)
+                xml.append('</%s>\n' % p.kind)
+            xml.append('    </requires>\n')
         if len(self.custom) > 0:
-            xml += '    <custom>\n'
+            xml.append('    <custom>\n')
             for key in self.custom:
-                xml += '      <value key="%s">%s</value>\n' % (key, self.custom[key])
-            xml += '    </custom>\n'
-        xml += '  </component>\n'
-        return xml
+                xml.append('      <value key="%s">%s</value>\n' % (key, self.custom[key]))
+            xml.append('    </custom>\n')
+        xml.append('  </component>\n')
+        return ''.join(xml)
+
+    @property
+    def releases(self):
+        """ The releases, newest first """
+        return self._releases
+
+    @releases.setter
+    def releases(self, releases):
+        for rel in self._releases:
+            rel._parent = None
+        self._releases._parent = None
+        self._releases = ReleaseList(releases, self)
+        self.invalidate()
 
     def add_release(self, release):
         """ Add a release object if it does not already exist """
-        for r in self.releases:
-            if r.version == release.version:
-                return
-        self.releases.append(release)
+        if self._releases.get_by_version(release.version):
+            return
+        self._releases.append(release)
+
+    def get_release_by_version(self, version):
+        """ Returns the release with a specific version """
+        return self._releases.get_by_version(version)
+
+    def get_release_latest(self):
+        """ Returns the newest release """
+        if len(self._releases) == 0:
+            return None
+        return self._releases[0]
 
     def add_review(self, review):
         """ Add a release object if it does not already exist """
@@ -442,12 +769,15 @@ class Component(object):
             if r.id == review.id:
                 return
         self.reviews.append(review)
+        self.invalidate()
 
     def add_screenshot(self, screenshot):
         """ Add a screenshot object if it does not already exist """
         if screenshot in self.screenshots:
             return
         self.screenshots.append(screenshot)
+        screenshot._parent = self
+        self.invalidate()
 
     def add_provide(self, provide):
         """ Add a provide object if it does not already exist """
@@ -455,6 +785,7 @@ class Component(object):
             if p.value == provide.value:
                 return
         self.provides.append(provide)
+        self.invalidate()
 
     def get_provides_by_kind(self, kind):
         """ Returns an array of provides of a certain kind """
@@ -470,6 +801,7 @@ class Component(object):
             if p.value == require.value:
                 return
         self.requires.append(require)
+        self.invalidate()
 
     def get_require_by_kind(self, kind, value):
         """ Returns a requires object of a specific value """
@@ -480,24 +812,29 @@ class Component(object):
 
     def validate(self):
         """ Parse XML data """
+        errors = self.get_validation_errors()
+        if errors:
+            raise errors[0]
+
+    def get_validation_errors(self):
+        """ Returns a list of every ValidationError for the component """
+        errors = []
         if not self.id or len(self.id) == 0:
-            raise ValidationError('No <id> tag')
+            errors.append(ValidationError('No <id> tag'))
         if not self.name or len(self.name) == 0:
-            raise ValidationError('No <name> tag')
+            errors.append(ValidationError('No <name> tag'))
         if not self.summary or len(self.summary) == 0:
-            raise ValidationError('No <summary> tag')
+            errors.append(ValidationError('No <summary> tag'))
         if not self.description or len(self.description) == 0:
-            raise ValidationError('No <description> tag')
+            errors.append(ValidationError('No <description> tag'))
         if self.kind == 'firmware':
             if len(self.provides) == 0:
-                raise ValidationError('No <provides> tag')
+                errors.append(ValidationError('No <provides> tag'))
             if len(self.releases) == 0:
-                raise ValidationError('No <release> tag')
+                errors.append(ValidationError('No <release> tag'))
         if self.kind == 'desktop':
             if len(self.screenshots) == 0:
-                raise ValidationError('No <screenshot> tag')
-        if not self.metadata_license or len(self.metadata_license) == 0:
-            raise ValidationError('No <metadata_license> tag')
+                errors.append(ValidationError('No <screenshot> tag'))
         valid_licenses = [
             'CC0-1.0',
             'CC-BY-3.0',
@@ -509,55 +846,51 @@ class Component(object):
             'GFDL-1.3',
             'FSFAP'
         ]
-        if self.metadata_license not in valid_licenses:
-            raise ValidationError('Invalid <metadata_license> tag')
+        if not self.metadata_license or len(self.metadata_license) == 0:
+            errors.append(ValidationError('No <metadata_license> tag'))
+        elif self.metadata_license not in valid_licenses:
+            errors.append(ValidationError('Invalid <metadata_license> tag'))
         if not self.project_license or len(self.project_license) == 0:
-            raise ValidationError('No <project_license> tag')
+            errors.append(ValidationError('No <project_license> tag'))
         if not self.developer_name or len(self.developer_name) == 0:
-            raise ValidationError('No <developer_name> tag')
+            errors.append(ValidationError('No <developer_name> tag'))
 
         # verify release objects
         for rel in self.releases:
             if not rel.version or len(rel.version) == 0:
-                raise ValidationError('No version in <release> tag')
+                errors.append(ValidationError('No version in <release> tag'))
             if rel.timestamp == 0:
-                raise ValidationError('No timestamp in <release> tag')
+                errors.append(ValidationError('No timestamp in <release> tag'))
+        return errors
 
-    def parse(self, xml_data):
-        """ Parse XML data """
+    def parse(self, xml_data, fields=None):
+        """ Parse XML data
+
+        If fields is set only the listed attributes are parsed, e.g.
+        fields=['provides', 'releases'], and the other children of
+        <component> are skipped. The id is always parsed.
+        """
+        fields = _check_fields(fields)
 
         # parse tree
         if isinstance(xml_data, string_types):
             # Presumably, this is textual xml data.
-            try:
-                root = ET.fromstring(xml_data)
-            except StdlibParseError as e:
-                raise ParseError(str(e))
+            root = etree.fromstring(xml_data)
         else:
             # Otherwise, assume it has already been parsed into a tree
             root = xml_data
 
         # get type
-        if 'type' in root.attrib:
-            self.kind = root.attrib['type']
+        if fields is None or 'kind' in fields:
+            self._parse_attrib(root.attrib)
 
         # parse component
         for c1 in root:
-
-            # <id>
-            if c1.tag == 'id':
-                self.id = c1.text
-
-            # <updatecontact>
-            elif c1.tag == 'updatecontact' or c1.tag == 'update_contact':
-                self.update_contact = c1.text
-
-            # <metadata_license>
-            elif c1.tag == 'metadata_license':
-                self.metadata_license = c1.text
+            if fields is not None and _TAG_FIELDS.get(c1.tag) not in fields:
+                continue
 
             # <releases>
-            elif c1.tag == 'releases':
+            if c1.tag == 'releases':
                 for c2 in c1:
                     if c2.tag == 'release':
                         rel = Release()
@@ -594,68 +927,92 @@ class Component(object):
                     req._parse_tree(c2)
                     self.add_require(req)
 
-            # <kudos>
-            elif c1.tag == 'kudos':
-                for c2 in c1:
-                    if not c2.tag == 'kudo':
-                        continue
-                    self.kudos.append(c2.text)
-
-            # <keywords>
-            elif c1.tag == 'keywords':
-                for c2 in c1:
-                    if not c2.tag == 'keyword':
-                        continue
-                    self.keywords.append(c2.text)
-
-            # <categories>
-            elif c1.tag == 'categories':
+            # <kudos>, <keywords>, <categories> and <custom>
+            elif c1.tag in _LIST_TAGS:
                 for c2 in c1:
-                    if not c2.tag == 'category':
-                        continue
-                    self.categories.append(c2.text)
-
-            # <custom>
-            elif c1.tag == 'custom':
-                for c2 in c1:
-                    if not c2.tag == 'value':
-                        continue
-                    if 'key' not in c2.attrib:
-                        continue
-                    self.custom[c2.attrib['key']] = c2.text
-
-            # <project_license>
-            elif c1.tag == 'project_license' or c1.tag == 'licence':
-                self.project_license = c1.text
-
-            # <developer_name>
-            elif c1.tag == 'developer_name':
-                self.developer_name = _join_lines(c1.text)
-
-            # <name>
-            elif c1.tag == 'name' and not self.name:
-                self.name = _join_lines(c1.text)
-
-            # <pkgname>
-            elif c1.tag == 'pkgname' and not self.pkgname:
-                self.pkgname = _join_lines(c1.text)
-
-            # <summary>
-            elif c1.tag == 'summary' and not self.summary:
-                self.summary = _join_lines(c1.text)
+                    self._parse_list_item(c1.tag, c2.tag, c2.attrib, c2.text)
 
             # <description>
-            elif c1.tag == 'description' and not self.description:
-                self.description = _parse_desc(c1)
-
-            # <url>
-            elif c1.tag == 'url':
-                key = 'homepage'
-                if 'type' in c1.attrib:
-                    key = c1.attrib['type']
-                self.urls[key] = c1.text
-
-            elif c1.tag == 'icon':
-                key = c1.attrib.pop('type', 'unknown')
-                c1.attrib['value'] = c1.text
-                self.icons[key] = self.icons.get(key, []) + [c1.attrib]
+            elif c1.tag == 'description':
+                if not self.description:
+                    self.description = _parse_desc(c1)
+
+            else:
+                self._parse_element(c1.tag, c1.attrib, c1.text)
+
+    def _parse_attrib(self, attrib):
+        """ Parse the attributes of a <component> element """
+        if 'type' in attrib:
+            self.kind = _intern(attrib['type'])
+
+    def _parse_list_item(self, parent_tag, tag, attrib, text):
+        """ Parse a child of <kudos>, <keywords>, <categories> or <custom> """
+
+        # <kudos>
+        if parent_tag == 'kudos':
+            if tag == 'kudo':
+                self.kudos.append(text)
+
+        # <keywords>
+        elif parent_tag == 'keywords':
+            if tag == 'keyword':
+                self.keywords.append(text)
+
+        # <categories>
+        elif parent_tag == 'categories':
+            if tag == 'category':
+                self.categories.append(_intern(text))
+
+        # <custom>
+        elif parent_tag == 'custom':
+            if tag == 'value' and 'key' in attrib:
+                self.custom[attrib['key']] = text
+
+    def _parse_element(self, tag, attrib, text):
+        """ Parse a child of <component> that has no child elements """
+
+        # <id>
+        if tag == 'id':
+            self.id = text
+
+        # <updatecontact>
+        elif tag == 'updatecontact' or tag == 'update_contact':
+            self.update_contact = text
+
+        # <metadata_license>
+        elif tag == 'metadata_license':
+            self.metadata_license = _intern(text)
+
+        # <project_license>
+        elif tag == 'project_license' or tag == 'licence':
+            self.project_license = _intern(text)
+
+        # <developer_name>
+        elif tag == 'developer_name':
+            self.developer_name = _intern(_join_lines(text))
+
+        # <name>
+        elif tag == 'name' and not self.name:
+            self.name = _join_lines(text)
+
+        # <pkgname>
+        elif tag == 'pkgname' and not self.pkgname:
+            self.pkgname = _join_lines(text)
+
+        # <summary>
+        elif tag == 'summary' and not self.summary:
+            self.summary = _join_lines(text)
+
+        # <url>
+        elif tag == 'url':
+            key = 'homepage'
+            if 'type' in attrib:
+                key = attrib['type']
+            self.urls[key] = text
+
+        # <icon>
+        elif tag == 'icon':
+            icon = dict(attrib)
+            key = icon.pop('type', 'unknown')
+            icon['value'] = text
+            self.icons[key] = self.icons.get(key, []) + [icon]
@@ -0,0 +1,165 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+import copy
+
+from appstream.utils import _canonical
+
+# A delta is a dict of:
+#
+#  'origin':   the origin of the new store
+#  'added':    list of new Component objects
+#  'removed':  list of removed component IDs
+#  'changed':  dict of component ID -> component change
+#
+# where a component change is a dict of:
+#
+#  'fields':   dict of attribute -> new value, replacing the old value
+#  'releases': {'added': [Release], 'removed': [version],
+#               'changed': {version: release change}}
+#  'reviews':  {'added': [Review], 'removed': [review ID]}
+#
+# and a release change is a dict of:
+#
+#  'fields':    dict of attribute -> new value
+#  'checksums': {'added': [Checksum], 'removed': [target]}
+
+# attributes diffed as a unit, rather than item by item
+_COMPONENT_FIELDS = ('update_contact', 'kind', 'provides', 'requires', 'name',
+                     'pkgname', 'summary', 'description', 'urls', 'icons',
+                     'metadata_license', 'project_license', 'developer_name',
+                     'screenshots', 'kudos', 'keywords', 'categories', 'custom')
+_RELEASE_FIELDS = ('description', 'timestamp', 'location', 'size_installed',
+                   'size_download', 'urgency')
+
+def _diff_fields(old, new, fields):
+    changes = {}
+    for field in fields:
+        value = getattr(new, field)
+        if _canonical(getattr(old, field)) != _canonical(value):
+            changes[field] = value
+    return changes
+
+def _diff_keyed(old_items, new_items, key):
+    """ Returns (added, removed, common) for lists of objects with a key """
+    old_map = dict([(key(item), item) for item in old_items])
+    new_map = dict([(key(item), item) for item in new_items])
+    added = [item for item in new_items if key(item) not in old_map]
+    removed = [k for k in old_map if k not in new_map]
+    common = [(old_map[key(item)], item) for item in new_items if key(item) in old_map]
+    return added, removed, common
+
+def _diff_release(old, new):
+    """ Returns a release change, or None if they are the same """
+    change = {}
+    fields = _diff_fields(old, new, _RELEASE_FIELDS)
+    if fields:
+        change['fields'] = fields
+    added, removed, common = _diff_keyed(old.checksums, new.checksums,
+                                         lambda csum: csum.target)
+    for old_csum, new_csum in common:
+        if _canonical(old_csum) != _canonical(new_csum):
+            added.append(new_csum)
+    if added or removed:
+        change['checksums'] = {'added': added, 'removed': removed}
+    return change or None
+
+def _diff_component(old, new):
+    """ Returns a component change, or None if they are the same """
+    change = {}
+    fields = _diff_fields(old, new, _COMPONENT_FIELDS)
+    if fields:
+        change['fields'] = fields
+
+    # releases
+    added, removed, common = _diff_keyed(old.releases, new.releases,
+                                         lambda rel: rel.version)
+    changed = {}
+    for old_rel, new_rel in common:
+        rel_change = _diff_release(old_rel, new_rel)
+        if rel_change:
+            changed[new_rel.version] = rel_change
+    if added or removed or changed:
+        change['releases'] = {'added': added, 'removed': removed, 'changed': changed}
+
+    # reviews are replaced if they have changed at all
+    added, removed, common = _diff_keyed(old.reviews, new.reviews,
+                                         lambda rev: rev.id)
+    for old_rev, new_rev in common:
+        if _canonical(old_rev) != _canonical(new_rev):
+            added.append(new_rev)
+            removed.append(new_rev.id)
+    if added or removed:
+        change['reviews'] = {'added': added, 'removed': removed}
+    return change or None
+
+def diff(old, new):
+    """ Returns the delta that turns the old store into the new store """
+    delta = {'origin': new.origin, 'added': [], 'removed': [], 'changed': {}}
+    for app_id in new.components:
+        component = new.components[app_id]
+        if app_id not in old.components:
+            delta['added'].append(component)
+            continue
+        change = _diff_component(old.components[app_id], component)
+        if change:
+            delta['changed'][app_id] = change
+    for app_id in old.components:
+        if app_id not in new.components:
+            delta['removed'].append(app_id)
+    return delta
+
+def _apply_release(rel, change):
+    for field, value in change.get('fields', {}).items():
+        setattr(rel, field, copy.deepcopy(value))
+    checksums = change.get('checksums')
+    if checksums:
+        rel.checksums = [csum for csum in rel.checksums
+                         if csum.target not in checksums['removed']]
+        for csum in checksums['added']:
+            rel.add_checksum(copy.deepcopy(csum))
+
+def apply_component(component, change):
+    """ Apply a component change from a delta """
+    component.invalidate()
+    for field, value in change.get('fields', {}).items():
+        setattr(component, field, copy.deepcopy(value))
+    for ss in component.screenshots:
+        ss._parent = component
+
+    releases = change.get('releases')
+    if releases:
+        for version in releases['removed']:
+            rel = component.get_release_by_version(version)
+            if rel:
+                component.releases.remove(rel)
+        for version, rel_change in releases['changed'].items():
+            rel = component.get_release_by_version(version)
+            if rel:
+                _apply_release(rel, rel_change)
+        for rel in releases['added']:
+            component.add_release(copy.deepcopy(rel))
+
+    reviews = change.get('reviews')
+    if reviews:
+        component.reviews = [rev for rev in component.reviews
+                             if rev.id not in reviews['removed']]
+        for rev in reviews['added']:
+            component.add_review(copy.deepcopy(rev))
@@ -0,0 +1,113 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" The ElementTree implementation used for parsing
+
+lxml is used if it is installed, and xml.etree.ElementTree otherwise. Both
+produce identical components; use() can be called to force one of them.
+"""
+
+import xml.etree.ElementTree as ET
+
+try:
+    # Py2.7 and newer
+    from xml.etree.ElementTree import ParseError as StdlibParseError
+except ImportError:
+    # Py2.6 and older
+    from xml.parsers.expat import ExpatError as StdlibParseError
+
+try:
+    from lxml import etree as _lxml
+    _ERRORS = (StdlibParseError, _lxml.XMLSyntaxError)
+except ImportError:
+    _lxml = None
+    _ERRORS = (StdlibParseError,)
+
+# comments and processing instructions would otherwise be returned as
+# children; no external DTD or entity is ever loaded, and internal entities
+# are expanded like the stdlib does where lxml is new enough to tell them
+# apart, as resolve_entities=True would also read external ones
+_LXML_OPTIONS = {'huge_tree': True, 'remove_comments': True, 'remove_pis': True,
+                 'load_dtd': False, 'no_network': True, 'resolve_entities': False}
+if _lxml is not None and _lxml.LXML_VERSION >= (5, 0):
+    _LXML_OPTIONS['resolve_entities'] = 'internal'
+
+from appstream.errors import ParseError
+
+# the name of the implementation in use
+name = None
+
+# the parsers are created when first needed, and only for lxml
+_parsers = {}
+
+def available():
+    """ Returns the names of the implementations that can be used """
+    if _lxml is not None:
+        return ['lxml', 'stdlib']
+    return ['stdlib']
+
+def use(implementation=None):
+    """ Select 'lxml' or 'stdlib', or the fastest one available if None """
+    global name
+    if implementation is None:
+        implementation = available()[0]
+    if implementation not in available():
+        raise ValueError('XML implementation %s not available' % implementation)
+    name = implementation
+
+def _lxml_parser(encoding=None):
+    try:
+        return _parsers[encoding]
+    except KeyError:
+        pass
+    parser = _lxml.XMLParser(encoding=encoding, **_LXML_OPTIONS)
+    _parsers[encoding] = parser
+    return parser
+
+def fromstring(xml_data):
+    """ Returns the root element of a document, raising ParseError if invalid """
+    if name == 'lxml':
+        # like the stdlib, ignore the declared encoding of text input
+        encoding = None
+        if not isinstance(xml_data, bytes):
+            xml_data = xml_data.encode('utf-8')
+            encoding = 'utf-8'
+        try:
+            return _lxml.fromstring(xml_data, _lxml_parser(encoding))
+        except _ERRORS as e:
+            raise ParseError(str(e))
+    try:
+        return ET.fromstring(xml_data)
+    except _ERRORS as e:
+        raise ParseError(str(e))
+
+def iterparse(f):
+    """ Yields ('start', element) and ('end', element) from a file object """
+    try:
+        if name == 'lxml':
+            events = _lxml.iterparse(f, events=('start', 'end'), **_LXML_OPTIONS)
+        else:
+            events = ET.iterparse(f, events=('start', 'end'))
+        for event, elem in events:
+            yield event, elem
+    except _ERRORS as e:
+        raise ParseError(str(e))
+
+use()
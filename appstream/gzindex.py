@@ -0,0 +1,224 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" Gzipped stores with an index for reading single components
+
+The file is an ordinary gzip file, but the deflate stream is fully flushed
+before a component once a block of data has been written since the last
+flush, so decompression can start at that point without any of the data
+before it. Flushing before every component would make the file much larger,
+as the compression dictionary is reset each time.
+
+The sidecar index is JSON saved next to it:
+
+  'origin':      the origin of the store
+  'size':        the size of the gzip file the index was written for
+  'trailer':     [CRC-32, uncompressed size] from the end of the gzip file
+  'points':      [compressed offset, uncompressed offset] of each flush
+  'components':  component ID -> [compressed offset of the flush before it,
+                                   uncompressed offset, uncompressed length]
+
+where compressed offsets are from the start of the file, and uncompressed
+offsets are from the start of the XML document.
+"""
+
+import bisect
+import json
+import os
+import struct
+import time
+import zlib
+
+from appstream.component import Component
+from appstream.errors import ParseError
+
+_VERSION = 2
+_CHUNK_SIZE = 16384
+
+# the uncompressed size of data between flushes
+BLOCK_SIZE = 65536
+
+def index_filename(filename):
+    """ Returns the filename of the index for a gzip file """
+    return filename + '.idx'
+
+class _Writer(object):
+    """ Writes a gzip member, recording where the flushes are """
+
+    def __init__(self, f):
+        self._f = f
+        self._compress = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self._crc = zlib.crc32(b'') & 0xffffffff
+        self.compressed = 0
+        self.uncompressed = 0
+
+        # no filename, and the operating system is unknown
+        header = b'\x1f\x8b\x08\x00' + struct.pack('<I', int(time.time())) + b'\x02\xff'
+        self._write(header)
+
+    def _write(self, data):
+        self._f.write(data)
+        self.compressed += len(data)
+
+    def write(self, data):
+        self._crc = zlib.crc32(data, self._crc) & 0xffffffff
+        self.uncompressed += len(data)
+        self._write(self._compress.compress(data))
+
+    def flush(self):
+        """ Returns a (compressed, uncompressed) access point """
+        self._write(self._compress.flush(zlib.Z_FULL_FLUSH))
+        return [self.compressed, self.uncompressed]
+
+    def close(self):
+        """ Returns the [CRC-32, uncompressed size] written in the trailer """
+        self._write(self._compress.flush(zlib.Z_FINISH))
+        trailer = [self._crc, self.uncompressed & 0xffffffff]
+        self._write(struct.pack('<II', *trailer))
+        return trailer
+
+def write(store, filename, block_size=BLOCK_SIZE):
+    """ Write a store as a gzip file with an index
+
+    A smaller block_size makes reading a component faster, and the file
+    larger.
+    """
+    components = {}
+    with open(filename, 'wb') as f:
+        writer = _Writer(f)
+        points = [[writer.compressed, 0]]
+        writer.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        if len(store.components) == 0:
+            writer.write(('<components version="0.9" origin="%s"/>\n' %
+                          store.origin).encode('utf-8'))
+        else:
+            writer.write(('<components version="0.9" origin="%s">\n' %
+                          store.origin).encode('utf-8'))
+            for app_id in store.components:
+                if writer.uncompressed - points[-1][1] >= block_size:
+                    points.append(writer.flush())
+                data = store.components[app_id].to_xml().encode('utf-8')
+                components[app_id] = [points[-1][0], writer.uncompressed, len(data)]
+                writer.write(data)
+            writer.write(b'</components>\n')
+        trailer = writer.close()
+
+    index = {'version': _VERSION, 'origin': store.origin,
+             'size': os.path.getsize(filename), 'trailer': trailer,
+             'points': points, 'components': components}
+    with open(index_filename(filename), 'w') as f:
+        json.dump(index, f, sort_keys=True)
+
+def _read_trailer(f):
+    """ Returns the [CRC-32, uncompressed size] at the end of a gzip file """
+    f.seek(-8, os.SEEK_END)
+    return list(struct.unpack('<II', f.read(8)))
+
+class IndexedStore(object):
+    """ A read-only store that decompresses components only when required """
+
+    def __init__(self, filename):
+        """ Load the index of a gzip file written with an index """
+        try:
+            with open(index_filename(filename)) as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            raise ParseError('failed to load index for %s: %s' % (filename, str(e)))
+        if index.get('version') != _VERSION:
+            raise ParseError('unsupported index version for %s' % filename)
+        self._f = open(filename, 'rb')
+
+        # a file rewritten with the same size has a different checksum
+        if os.fstat(self._f.fileno()).st_size != index['size'] or \
+                _read_trailer(self._f) != index['trailer']:
+            self._f.close()
+            raise ParseError('%s has changed since it was indexed' % filename)
+        self.origin = index['origin']
+        self._points = index['points']
+        self._starts = [point[1] for point in self._points]
+        self._components = index['components']
+
+    def close(self):
+        """ Close the file """
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._components)
+
+    def read(self, offset, length):
+        """ Returns bytes of the uncompressed document
+
+        Decompression starts at the nearest access point before the offset.
+        """
+        idx = bisect.bisect_right(self._starts, offset) - 1
+        compressed, uncompressed = self._points[idx]
+        skip = offset - uncompressed
+        self._f.seek(compressed)
+        decompress = zlib.decompressobj(-zlib.MAX_WBITS)
+        data = []
+        size = 0
+        while size < skip + length:
+            chunk = self._f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            out = decompress.decompress(chunk)
+            data.append(out)
+            size += len(out)
+            if decompress.unused_data:
+                break
+        return b''.join(data)[skip:skip + length]
+
+    def get_component_xml(self, app_id):
+        """ Returns the XML of a component as UTF-8, or None if not found """
+        entry = self._components.get(app_id)
+        if not entry:
+            return None
+        return self.read(entry[1], entry[2])
+
+    def get_component(self, app_id, fields=None):
+        """ Finds an application from the store
+
+        Fields is a projection as for Component.parse().
+        """
+        xml = self.get_component_xml(app_id)
+        if xml is None:
+            return None
+        component = Component()
+        component.parse(xml, fields)
+        return component
+
+    def get_component_ids(self):
+        """ Returns the IDs of all the applications in the store """
+        return list(self._components)
+
+    def iter_components(self):
+        """ Yields all the applications from the store in file order """
+        for app_id in sorted(self._components, key=lambda k: self._components[k][1]):
+            yield self.get_component(app_id)
+
+    def get_components(self):
+        """ Returns all the applications from the store """
+        return list(self.iter_components())
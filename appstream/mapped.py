@@ -0,0 +1,134 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+import mmap
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from appstream.errors import ParseError
+
+# file layout:
+#  magic, header, entry table sorted by ID, ID data, component data
+_MAGIC = b'ASMAP\x00\x00\x01'
+_HEADER = struct.Struct('<II')          # component count, origin length
+_ENTRY = struct.Struct('<QIQQ')         # ID offset, ID length, data offset, data length
+
+def write(store, filename):
+    """ Write a store in the mapped format """
+    origin = (store.origin or '').encode('utf-8')
+    ids = sorted([(app_id.encode('utf-8'), app_id) for app_id in store.components])
+    table_offset = len(_MAGIC) + _HEADER.size + len(origin)
+    offset = table_offset + len(ids) * _ENTRY.size
+
+    # IDs first, so that a lookup only touches the start of the file
+    entries = []
+    for key, _ in ids:
+        entries.append([offset, len(key), 0, 0])
+        offset += len(key)
+    blobs = []
+    for i, (_, app_id) in enumerate(ids):
+        blob = pickle.dumps(store.components[app_id], pickle.HIGHEST_PROTOCOL)
+        entries[i][2] = offset
+        entries[i][3] = len(blob)
+        offset += len(blob)
+        blobs.append(blob)
+
+    with open(filename, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(len(ids), len(origin)))
+        f.write(origin)
+        for entry in entries:
+            f.write(_ENTRY.pack(*entry))
+        for key, _ in ids:
+            f.write(key)
+        for blob in blobs:
+            f.write(blob)
+
+class MappedStore(object):
+    """ A read-only store that decodes components only when required """
+
+    def __init__(self, filename):
+        """ Map the file into memory """
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self._map.close()
+            raise ParseError('%s is not a mapped store' % filename)
+        offset = len(_MAGIC)
+        self._count, origin_len = _HEADER.unpack_from(self._map, offset)
+        offset += _HEADER.size
+        self.origin = self._map[offset:offset + origin_len].decode('utf-8') or None
+        self._table = offset + origin_len
+
+    def close(self):
+        """ Unmap the file """
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, idx):
+        """ Returns the (ID, data offset, data length) of a table entry """
+        id_off, id_len, data_off, data_len = \
+            _ENTRY.unpack_from(self._map, self._table + idx * _ENTRY.size)
+        return self._map[id_off:id_off + id_len], data_off, data_len
+
+    def _decode(self, data_off, data_len):
+        return pickle.loads(self._map[data_off:data_off + data_len])
+
+    def get_component(self, app_id):
+        """ Finds an application from the store """
+        key = app_id.encode('utf-8')
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, data_off, data_len = self._entry(mid)
+            if mid_key == key:
+                return self._decode(data_off, data_len)
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def get_component_ids(self):
+        """ Returns the IDs of all the applications in the store """
+        return [self._entry(i)[0].decode('utf-8') for i in range(self._count)]
+
+    def iter_components(self):
+        """ Yields all the applications from the store """
+        for i in range(self._count):
+            _, data_off, data_len = self._entry(i)
+            yield self._decode(data_off, data_len)
+
+    def get_components(self):
+        """ Returns all the applications from the store """
+        return list(self.iter_components())
@@ -0,0 +1,149 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+from appstream.utils import _canonical
+
+# attributes where the value from the highest priority origin wins
+_SCALAR_FIELDS = ('update_contact', 'kind', 'name', 'pkgname', 'summary',
+                  'description', 'metadata_license', 'project_license',
+                  'developer_name')
+
+# dict attributes where each key is resolved separately
+_DICT_FIELDS = ('urls', 'icons', 'custom')
+
+# list attributes where the items from every origin are combined
+_LIST_FIELDS = ('kudos', 'keywords', 'categories')
+
+class _Provenance(object):
+    """ The origin and priority each value of a component came from """
+
+    def __init__(self, provenance, priorities, origin, priority):
+        self._provenance = provenance
+        self._priorities = priorities
+        self._origin = origin
+        self._priority = priority
+
+    def wins(self, key):
+        """ Returns True if the new value should replace the existing one
+
+        Existing values with no recorded priority were added without a
+        priority, and are treated as priority 0.
+        """
+        return self._priority > self._priorities.get(key, 0)
+
+    def record(self, key):
+        self._provenance[key] = self._origin
+        self._priorities[key] = self._priority
+
+def _merge_release(rel, new, prov=None):
+    """ Add the checksums of a release with the same version """
+    targets = set([csum.target for csum in rel.checksums])
+    for csum in new.checksums:
+        if csum.target in targets:
+            continue
+        rel.add_checksum(csum)
+        targets.add(csum.target)
+        if prov:
+            prov.record(('checksum', rel.version, csum.target))
+
+def merge_component(old, new, prov):
+    """ Merge the values of new into old
+
+    This takes linear time in the size of the components, as all the
+    de-duplication is done using dicts and sets of keys.
+    """
+    for field in _SCALAR_FIELDS:
+        value = getattr(new, field)
+        if not value:
+            continue
+        if not getattr(old, field) or prov.wins(field):
+            setattr(old, field, value)
+            prov.record(field)
+
+    for field in _DICT_FIELDS:
+        values = getattr(old, field)
+        new_values = getattr(new, field)
+        for key in new_values:
+            if key not in values or prov.wins((field, key)):
+                values[key] = new_values[key]
+                prov.record((field, key))
+
+    for field in _LIST_FIELDS:
+        values = getattr(old, field)
+        seen = set(values)
+        for value in getattr(new, field):
+            if value in seen:
+                continue
+            values.append(value)
+            seen.add(value)
+            prov.record((field, value))
+
+    # provides and requires
+    seen = set([(p.kind, p.value) for p in old.provides])
+    for p in new.provides:
+        if (p.kind, p.value) not in seen:
+            old.provides.append(p)
+            seen.add((p.kind, p.value))
+            prov.record(('provide', p.kind, p.value))
+    seen = set([(r.kind, r.value) for r in old.requires])
+    for r in new.requires:
+        if (r.kind, r.value) not in seen:
+            old.requires.append(r)
+            seen.add((r.kind, r.value))
+            prov.record(('require', r.kind, r.value))
+
+    # releases, keyed by version
+    for rel in new.releases:
+        key = ('release', rel.version)
+        old_rel = old.get_release_by_version(rel.version)
+        if not old_rel:
+            old.add_release(rel)
+            prov.record(key)
+        elif prov.wins(key):
+            old.releases.remove(old_rel)
+            old.add_release(rel)
+            prov.record(key)
+            _merge_release(rel, old_rel)
+        else:
+            _merge_release(old_rel, rel, prov)
+
+    # reviews, keyed by ID
+    reviews = dict([(rev.id, idx) for idx, rev in enumerate(old.reviews)])
+    for rev in new.reviews:
+        key = ('review', rev.id)
+        if rev.id not in reviews:
+            reviews[rev.id] = len(old.reviews)
+            old.reviews.append(rev)
+            prov.record(key)
+        elif prov.wins(key):
+            old.reviews[reviews[rev.id]] = rev
+            prov.record(key)
+
+    # screenshots, keyed by content
+    seen = set([_canonical(ss) for ss in old.screenshots])
+    for ss in new.screenshots:
+        key = _canonical(ss)
+        if key in seen:
+            continue
+        old.add_screenshot(ss)
+        seen.add(key)
+        prov.record(('screenshot', len(old.screenshots) - 1))
+
+    old.invalidate()
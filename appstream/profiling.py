@@ -0,0 +1,246 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" Opt-in instrumentation of parsing and serializing
+
+When enabled the functions of interest are replaced by timed wrappers, and
+the originals are put back when disabled, so there is no overhead at all
+unless profiling is in use. Timings are inclusive, e.g. the time for
+Component.parse includes the time spent in Release._parse_tree.
+
+    with appstream.profiling.profile() as stats:
+        store.from_file('firmware.xml.gz')
+    print(stats.report())
+
+Profiling changes global state and is not thread-safe.
+"""
+
+import contextlib
+import os
+import time
+
+from appstream import component as _component
+from appstream import etree as _etree
+from appstream import gzindex as _gzindex
+from appstream import sax as _sax
+from appstream import store as _store
+from appstream import utils as _utils
+from appstream.component import string_types
+
+class Stats(object):
+    """ Counters collected while profiling is enabled """
+
+    def __init__(self, callback=None):
+        """ Set defaults
+
+        If set, callback is called with the phase name and elapsed time in
+        seconds each time a phase finishes.
+        """
+        self.timings = {}
+        self.calls = {}
+        self.elements = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.callback = callback
+
+    def add_timing(self, phase, elapsed):
+        """ Record a call of a phase """
+        self.timings[phase] = self.timings.get(phase, 0.0) + elapsed
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        if self.callback:
+            self.callback(phase, elapsed)
+
+    def report(self):
+        """ Returns the counters as human readable text """
+        lines = []
+        for phase in sorted(self.timings, key=lambda p: -self.timings[p]):
+            lines.append('%-32s %8i calls %10.2f ms' %
+                         (phase, self.calls[phase], self.timings[phase] * 1000))
+        for tag in sorted(self.elements, key=lambda t: -self.elements[t]):
+            lines.append('<%s> %i' % (tag, self.elements[tag]))
+        lines.append('bytes in: %i' % self.bytes_in)
+        lines.append('bytes out: %i' % self.bytes_out)
+        return '\n'.join(lines)
+
+class _CountingWriter(object):
+    """ A file object wrapper that counts the bytes written """
+
+    def __init__(self, f, stats):
+        self._f = f
+        self._stats = stats
+
+    def write(self, data):
+        self._stats.bytes_out += len(data)
+        return self._f.write(data)
+
+# (object, attribute, phase name), where functions with no phase name are
+# only wrapped to collect counters
+_PHASES = [
+    (_store.Store, 'parse', 'Store.parse'),
+    (_store.Store, 'from_file', 'Store.from_file'),
+    (_store.Store, 'iter_file', 'Store.iter_file'),
+    (_store.Store, 'to_xml', 'Store.to_xml'),
+    (_store.Store, 'to_fileobj', 'Store.to_fileobj'),
+    (_component.Component, 'parse', 'Component.parse'),
+    (_component.Component, '_to_xml', 'Component.to_xml'),
+    (_component.Component, 'add_release', 'Component.add_release'),
+    (_component.Component, 'add_review', 'Component.add_review'),
+    (_component.Component, 'add_screenshot', 'Component.add_screenshot'),
+    (_component.Component, 'add_provide', 'Component.add_provide'),
+    (_component.Component, 'add_require', 'Component.add_require'),
+    (_component.Release, '_parse_tree', 'Release._parse_tree'),
+    (_component.Release, 'to_xml', 'Release.to_xml'),
+    (_component.Release, 'add_checksum', 'Release.add_checksum'),
+    (_component.Review, '_parse_tree', 'Review._parse_tree'),
+    (_component.Review, 'to_xml', 'Review.to_xml'),
+    (_component.Screenshot, '_parse_tree', 'Screenshot._parse_tree'),
+    (_component.Screenshot, 'to_xml', 'Screenshot.to_xml'),
+    (_component.Screenshot, 'add_image', 'Screenshot.add_image'),
+    (_component.Checksum, '_parse_tree', 'Checksum._parse_tree'),
+    (_component.Image, '_parse_tree', 'Image._parse_tree'),
+    (_component.Provide, '_parse_tree', 'Provide._parse_tree'),
+    (_component.Require, '_parse_tree', 'Require._parse_tree'),
+    (_component, '_parse_desc', '_parse_desc'),
+    (_utils, '_parse_desc', '_parse_desc'),
+    (_component, '_parse_date', '_parse_date'),
+    (_utils, '_parse_date_slow', 'dateutil'),
+    (_etree, 'fromstring', 'ET.fromstring'),
+    (_sax, '_parse_desc', '_parse_desc'),
+    (_sax.Parser, '_start', None),
+    (_gzindex.IndexedStore, 'get_component', 'IndexedStore.get_component'),
+]
+
+# phases that are generators, where only the time spent producing each item
+# is counted and not the time spent by the caller consuming it
+_GENERATORS = ('Store.iter_file',)
+
+_active = None
+_originals = []
+
+def _timed(func, phase, stats):
+    # only the outermost call is counted if a phase calls itself, e.g. when
+    # Store.from_file() parses into a temporary store to be cached
+    depth = [0]
+    def wrapper(*args, **kwargs):
+        if depth[0]:
+            return func(*args, **kwargs)
+        depth[0] += 1
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            depth[0] -= 1
+            stats.add_timing(phase, time.time() - start)
+    return wrapper
+
+def _timed_generator(func, phase, stats):
+    def wrapper(*args, **kwargs):
+        it = func(*args, **kwargs)
+        elapsed = [0.0]
+        try:
+            while True:
+                start = time.time()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed[0] += time.time() - start
+                yield item
+        finally:
+            stats.add_timing(phase, elapsed[0])
+    return wrapper
+
+def _wrap_extra(obj, attr, func, stats):
+    """ Add the byte and element counting for specific functions """
+    if obj is _store.Store and attr == 'parse':
+        def store_parse(self, xml_data, *args, **kwargs):
+            stats.bytes_in += len(xml_data)
+            return func(self, xml_data, *args, **kwargs)
+        return store_parse
+    if obj is _store.Store and attr == 'iter_file':
+        def iter_file(self, filename, *args, **kwargs):
+            stats.bytes_in += os.path.getsize(filename)
+            return func(self, filename, *args, **kwargs)
+        return iter_file
+    if obj is _sax.Parser and attr == '_start':
+        def _start(self, tag, attrib):
+            name = _sax._fixname(tag)
+            stats.elements[name] = stats.elements.get(name, 0) + 1
+            return func(self, tag, attrib)
+        return _start
+    if obj is _store.Store and attr == 'to_xml':
+        def to_xml(self):
+            xml = func(self)
+            stats.bytes_out += len(xml)
+            return xml
+        return to_xml
+    if obj is _store.Store and attr == 'to_fileobj':
+        def to_fileobj(self, f):
+            return func(self, _CountingWriter(f, stats))
+        return to_fileobj
+    if obj is _component.Component and attr == 'parse':
+        def parse(self, xml_data, *args, **kwargs):
+            if isinstance(xml_data, string_types):
+                stats.bytes_in += len(xml_data)
+                xml_data = _etree.fromstring(xml_data)
+            for elem in xml_data.iter():
+                stats.elements[elem.tag] = stats.elements.get(elem.tag, 0) + 1
+            return func(self, xml_data, *args, **kwargs)
+        return parse
+    return func
+
+def enable(stats=None):
+    """ Start profiling, returning the Stats object being updated """
+    global _active
+    if _active:
+        disable()
+    if not stats:
+        stats = Stats()
+    for obj, attr, phase in _PHASES:
+        func = getattr(obj, attr)
+        if isinstance(obj, type):
+            func = obj.__dict__[attr]
+        _originals.append((obj, attr, func))
+        func = _wrap_extra(obj, attr, func, stats)
+        if phase in _GENERATORS:
+            func = _timed_generator(func, phase, stats)
+        elif phase:
+            func = _timed(func, phase, stats)
+        setattr(obj, attr, func)
+    _active = stats
+    return stats
+
+def disable():
+    """ Stop profiling and remove all the instrumentation """
+    global _active
+    while _originals:
+        obj, attr, func = _originals.pop()
+        setattr(obj, attr, func)
+    _active = None
+
+@contextlib.contextmanager
+def profile(stats=None):
+    """ Profile the code in a with block """
+    stats = enable(stats)
+    try:
+        yield stats
+    finally:
+        disable()
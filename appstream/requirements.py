@@ -0,0 +1,152 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+import fnmatch
+import re
+
+from appstream.utils import _version_key
+
+_VERSION_COMPARES = {
+    'lt': lambda a, b: a < b,
+    'gt': lambda a, b: a > b,
+    'le': lambda a, b: a <= b,
+    'ge': lambda a, b: a >= b,
+}
+
+def _never(version):
+    return False
+
+# versions where equal keys mean equal versions, e.g. 1.2 and 1.02
+_NUMERIC_VERSION = re.compile(r'^[0-9]+(\.[0-9]+)*$')
+
+def _compile_equal(wanted, equal):
+    """ Returns a test for eq or ne against a required version
+
+    The key drops separators and leading zeros, so for anything other than
+    plain dotted numbers the strings themselves are compared, otherwise
+    e.g. USB:0x046X would equal USB:0x46X.
+    """
+    wanted = wanted or ''
+    if not _NUMERIC_VERSION.match(wanted):
+        return lambda version: (version[0] == wanted) == equal
+    wanted_key = _version_key(wanted)
+    def test(version):
+        if _NUMERIC_VERSION.match(version[0]):
+            return (version[1] == wanted_key) == equal
+        return (version[0] == wanted) == equal
+    return test
+
+def _compile_require(component, req):
+    """ Returns (inventory key, test) where test takes an installed version """
+
+    # a <firmware> with no value refers to the device itself
+    key = req.value
+    if not key and req.kind == 'firmware':
+        key = component.id
+
+    if not req.compare:
+        return (key, lambda version: True)
+    if req.compare in ('eq', 'ne'):
+        return (key, _compile_equal(req.version, req.compare == 'eq'))
+    if req.compare in _VERSION_COMPARES:
+        op = _VERSION_COMPARES[req.compare]
+        wanted = _version_key(req.version)
+        return (key, lambda version: op(version[1], wanted))
+    if req.compare == 'glob':
+        regex = re.compile(fnmatch.translate(req.version or ''))
+        return (key, lambda version: regex.match(version[0]) is not None)
+    if req.compare == 'regex':
+        try:
+            regex = re.compile(req.version or '')
+        except re.error:
+            return (key, _never)
+        return (key, lambda version: regex.search(version[0]) is not None)
+    return (key, _never)
+
+class RequirementEvaluator(object):
+    """ Checks the requirements of every component against inventories
+
+    The requirements and release versions are compiled once, so that each
+    inventory can be checked cheaply. An inventory is a dict of installed
+    versions keyed by the value of the requirement, e.g. the component ID
+    for <id> or 'bootloader' for <firmware>; the component ID of a device
+    is used for a <firmware> requirement with no value.
+    """
+
+    def __init__(self, components, cache_size=65536):
+        """ Compile the requirements of a Store or list of components """
+        if hasattr(components, 'get_components'):
+            components = components.get_components()
+        self._compiled = {}
+        for component in components:
+            checks = [_compile_require(component, req)
+                      for req in component.requires if req.kind]
+            releases = [(_version_key(rel.version), rel) for rel in component.releases]
+            self._compiled[component.id] = (component, checks, releases)
+        self._versions = {}
+        self._cache_size = cache_size
+
+    def _version(self, version):
+        """ Returns the (string, key) for an installed version """
+        try:
+            return self._versions[version]
+        except KeyError:
+            pass
+        if len(self._versions) >= self._cache_size:
+            self._versions.clear()
+        value = (version, _version_key(version))
+        self._versions[version] = value
+        return value
+
+    def evaluate(self, inventory, app_ids=None):
+        """ Returns a dict of component ID -> acceptable releases, newest first
+
+        Only the components in app_ids are checked if it is set. Components
+        with unmet requirements are not included. If the inventory has a
+        version for the component ID itself then only newer releases are
+        acceptable.
+        """
+        if app_ids is None:
+            compiled = self._compiled.values()
+        else:
+            compiled = [self._compiled[app_id] for app_id in app_ids
+                        if app_id in self._compiled]
+        results = {}
+        for component, checks, releases in compiled:
+            satisfied = True
+            for key, test in checks:
+                installed = inventory.get(key)
+                if installed is None or not test(self._version(installed)):
+                    satisfied = False
+                    break
+            if not satisfied:
+                continue
+            installed = inventory.get(component.id)
+            if installed is None:
+                results[component.id] = [rel for _, rel in releases]
+                continue
+            installed_key = self._version(installed)[1]
+            results[component.id] = [rel for key, rel in releases if key > installed_key]
+        return results
+
+    def evaluate_many(self, inventories, app_ids=None):
+        """ Yields the result of evaluate() for each inventory """
+        for inventory in inventories:
+            yield self.evaluate(inventory, app_ids)
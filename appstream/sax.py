@@ -0,0 +1,293 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" A parser that builds components directly from expat callbacks
+
+No element tree is built, apart from a small one for each <description>
+and <caption> so they can be handed to the same _parse_desc() as used by
+the ElementTree backend. The objects are populated using the same
+_parse_attrib() and _parse_element() helpers, so both backends produce
+identical components.
+"""
+
+from xml.parsers import expat
+
+from appstream.component import Component, Release, Review, Screenshot, \
+                                Checksum, Image, Provide, Require, \
+                                _LIST_TAGS, _TAG_FIELDS, _check_fields
+from appstream.errors import ParseError
+from appstream.utils import _parse_desc
+
+# children of <component> that only hold other elements
+_CONTAINER_TAGS = ('releases', 'reviews', 'screenshots', 'provides',
+                   'requires') + _LIST_TAGS
+
+class _Element(list):
+    """ A captured element, looking enough like an ElementTree element for
+    _parse_desc() to use """
+
+    __slots__ = ('tag', 'attrib', 'text')
+
+    def __init__(self, tag, attrib):
+        list.__init__(self)
+        self.tag = tag
+        self.attrib = attrib
+        self.text = None
+
+def _fixname(name):
+    # expand a namespace prefix the same way ElementTree does
+    if '}' in name:
+        return '{' + name
+    return name
+
+class Parser(object):
+    """ Parses a <components> document, or a single <component>
+
+    Completed components are appended to the components list as soon as
+    their closing tag has been seen, so callers parsing incrementally using
+    feed() can consume and clear the list as they go.
+    """
+
+    def __init__(self, single=False, fields=None):
+        """ Set defaults
+
+        If single is True the document root is the <component> itself.
+        Fields is a projection as for Component.parse(), and the elements
+        that are not wanted are skipped without collecting any text.
+        """
+        self.root_attrib = None
+        self.components = []
+        self._fields = _check_fields(fields)
+
+        # the number of open elements being skipped
+        self._skip = 0
+
+        # the stack length of a <component> element
+        self._base = 1 if single else 2
+
+        # [tag, attrib, text] for each open element
+        self._stack = []
+
+        # text of the innermost element, or None once it has had a child,
+        # as ElementTree only keeps the text before the first child
+        self._chunks = None
+
+        # the component and the release, review or screenshot being parsed
+        self._objects = []
+
+        # the open elements of a <description> or <caption>
+        self._capture = []
+
+        self._parser = expat.ParserCreate(None, '}')
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+
+    def feed(self, data):
+        """ Parse some more of the document """
+        try:
+            self._parser.Parse(data, False)
+        except expat.ExpatError as e:
+            raise ParseError(str(e))
+
+    def close(self):
+        """ Finish parsing the document """
+        try:
+            self._parser.Parse(b'', True)
+        except expat.ExpatError as e:
+            raise ParseError(str(e))
+
+    def _data(self, text):
+        if self._chunks is not None:
+            self._chunks.append(text)
+
+    def _start(self, tag, attrib):
+        if self._skip:
+            self._skip += 1
+            return
+        if '}' in tag:
+            tag = _fixname(tag)
+        for key in attrib:
+            if '}' in key:
+                attrib = dict([(_fixname(k), v) for k, v in attrib.items()])
+                break
+        stack = self._stack
+        if self._chunks:
+            stack[-1][2] = ''.join(self._chunks)
+        if self._fields is not None and len(stack) == self._base and \
+                _TAG_FIELDS.get(tag) not in self._fields:
+            self._chunks = None
+            self._skip = 1
+            return
+        self._chunks = []
+        stack.append([tag, attrib, None])
+
+        capture = self._capture
+        if capture:
+            elem = _Element(tag, attrib)
+            capture[-1].append(elem)
+            capture.append(elem)
+            return
+
+        depth = len(stack) - self._base
+        if depth < 0:
+            if self.root_attrib is None:
+                self.root_attrib = attrib
+        elif depth == 0:
+            if self.root_attrib is None:
+                self.root_attrib = attrib
+            component = Component()
+            if self._fields is None or 'kind' in self._fields:
+                component._parse_attrib(attrib)
+            self._objects = [component]
+        elif depth == 1:
+            if tag == 'description':
+                capture.append(_Element(tag, attrib))
+        elif depth == 2:
+            parent_tag = stack[-2][0]
+            if parent_tag == 'releases' and tag == 'release':
+                obj = Release()
+            elif parent_tag == 'reviews' and tag == 'review':
+                obj = Review()
+            elif parent_tag == 'screenshots' and tag == 'screenshot':
+                obj = Screenshot()
+            else:
+                return
+            obj._parse_attrib(attrib)
+            self._objects.append(obj)
+        elif depth == 3 and len(self._objects) == 2:
+            if isinstance(self._objects[1], Screenshot):
+                if tag == 'caption':
+                    capture.append(_Element(tag, attrib))
+            elif tag == 'description':
+                capture.append(_Element(tag, attrib))
+
+    def _end(self, tag):
+        if self._skip:
+            self._skip -= 1
+            return
+        stack = self._stack
+        tag, attrib, text = stack.pop()
+        if self._chunks is not None:
+            if self._chunks:
+                text = ''.join(self._chunks)
+            self._chunks = None
+
+        capture = self._capture
+        if capture:
+            elem = capture.pop()
+            elem.text = text
+            if capture:
+                return
+        depth = len(stack) + 1 - self._base
+        if depth < 0:
+            return
+        objects = self._objects
+
+        # <component>
+        if depth == 0:
+            self.components.append(objects.pop())
+
+        # children of <component>
+        elif depth == 1:
+            component = objects[0]
+            if tag == 'description':
+                if not component.description:
+                    component.description = _parse_desc(elem)
+            elif tag not in _CONTAINER_TAGS:
+                component._parse_element(tag, attrib, text)
+
+        # <release>, <review>, <screenshot>, <provides> and <requires> items
+        elif depth == 2:
+            component = objects[0]
+            parent_tag = stack[-1][0]
+            if len(objects) == 2:
+                obj = objects.pop()
+                if isinstance(obj, Release):
+                    component.add_release(obj)
+                elif isinstance(obj, Review):
+                    component.add_review(obj)
+                else:
+                    component.add_screenshot(obj)
+            elif parent_tag == 'provides':
+                prov = Provide()
+                prov._parse_element(tag, attrib, text)
+                component.add_provide(prov)
+            elif parent_tag == 'requires':
+                req = Require()
+                req._parse_element(tag, attrib, text)
+                component.add_require(req)
+            elif parent_tag in _LIST_TAGS:
+                component._parse_list_item(parent_tag, tag, attrib, text)
+
+        # children of <release>, <review> and <screenshot>
+        elif depth == 3 and len(objects) == 2:
+            obj = objects[1]
+            if isinstance(obj, Release):
+                if tag == 'description':
+                    obj.description = _parse_desc(elem)
+                elif tag == 'checksum':
+                    csum = Checksum()
+                    csum._parse_element(attrib, text)
+                    obj.add_checksum(csum)
+                else:
+                    obj._parse_child(tag, attrib, text)
+            elif isinstance(obj, Review):
+                if tag == 'description':
+                    obj.description = _parse_desc(elem)
+                elif tag != 'metadata':
+                    obj._parse_child(tag, attrib, text)
+            elif tag == 'caption':
+                obj.caption = _parse_desc(elem)
+            elif tag == 'image':
+                im = Image()
+                im._parse_element(attrib, text)
+                obj.add_image(im)
+
+        # <review><metadata><value>
+        elif depth == 4 and len(objects) == 2:
+            obj = objects[1]
+            if isinstance(obj, Review) and stack[-1][0] == 'metadata':
+                obj._parse_metadata(tag, attrib, text)
+
+def parse(xml_data, single=False, fields=None):
+    """ Returns the Parser after parsing a complete document """
+    parser = Parser(single, fields)
+    parser.feed(xml_data)
+    parser.close()
+    return parser
+
+def iterparse(f, parser=None, chunk_size=65536):
+    """ Yields each component from a file object as it is parsed """
+    if parser is None:
+        parser = Parser()
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            break
+        parser.feed(data)
+        for component in parser.components:
+            yield component
+        del parser.components[:]
+    parser.close()
+    for component in parser.components:
+        yield component
+    del parser.components[:]
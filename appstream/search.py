@@ -0,0 +1,125 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+import bisect
+import re
+
+_MARKUP_RE = re.compile(r'<[^>]*>')
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# how much a match in each field counts towards the score
+_FIELD_WEIGHTS = (
+    ('name', 16),
+    ('keywords', 8),
+    ('summary', 4),
+    ('description', 1),
+)
+
+def _tokenize(text):
+    """ Split text, which may contain description markup, into tokens """
+    if not text:
+        return []
+    return _TOKEN_RE.findall(_MARKUP_RE.sub(' ', text).lower())
+
+def _component_tokens(component):
+    """ Returns a dict of token -> score for a component """
+    tokens = {}
+    for field, weight in _FIELD_WEIGHTS:
+        value = getattr(component, field)
+        if isinstance(value, list):
+            value = ' '.join([v for v in value if v])
+        for token in _tokenize(value):
+            tokens[token] = tokens.get(token, 0) + weight
+    return tokens
+
+class SearchIndex(object):
+    """ An incrementally built full-text index of components """
+
+    def __init__(self):
+        """ Set defaults """
+        self._postings = {}
+        self._tokens = {}
+        self._sorted = []
+        self._sorted_valid = True
+
+    def add(self, component):
+        """ Add a component to the index """
+        if component.id in self._tokens:
+            self.remove(component)
+        tokens = _component_tokens(component)
+        self._tokens[component.id] = list(tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._sorted_valid = False
+            postings[component.id] = tokens[token]
+
+    def remove(self, component):
+        """ Remove a component from the index """
+        for token in self._tokens.pop(component.id, []):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(component.id, None)
+            if not postings:
+                del self._postings[token]
+                self._sorted_valid = False
+
+    def _expand(self, prefix):
+        """ Returns all the indexed tokens starting with prefix """
+        if not self._sorted_valid:
+            self._sorted = sorted(self._postings)
+            self._sorted_valid = True
+        idx = bisect.bisect_left(self._sorted, prefix)
+        tokens = []
+        while idx < len(self._sorted) and self._sorted[idx].startswith(prefix):
+            tokens.append(self._sorted[idx])
+            idx += 1
+        return tokens
+
+    def search(self, query):
+        """ Returns a list of (score, app_id) for components matching query
+
+        Every search term has to match the prefix of a token in the
+        component, and exact matches score twice as much as prefix matches.
+        """
+        results = None
+        for term in _tokenize(query):
+            scores = {}
+            for token in self._expand(term):
+                multiplier = 2 if token == term else 1
+                postings = self._postings[token]
+                for app_id in postings:
+                    scores[app_id] = scores.get(app_id, 0) + postings[app_id] * multiplier
+            if results is None:
+                results = scores
+            else:
+                for app_id in list(results):
+                    if app_id in scores:
+                        results[app_id] += scores[app_id]
+                    else:
+                        del results[app_id]
+            if not results:
+                return []
+        if not results:
+            return []
+        return sorted([(results[app_id], app_id) for app_id in results],
+                      key=lambda r: (-r[0], r[1]))
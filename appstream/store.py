@@ -18,19 +18,65 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 # MA 02110-1301, USA
 
+import fnmatch
 import gzip
+import multiprocessing
+import os
 
-import xml.etree.ElementTree as ET
+import copy
 
-try:
-    # Py2.7 and newer
-    from xml.etree.ElementTree import ParseError as StdlibParseError
-except ImportError:
-    # Py2.6 and older
-    from xml.parsers.expat import ExpatError as StdlibParseError
+from appstream import cache
+from appstream import etree
+from appstream import gzindex
+from appstream import delta as _delta
+from appstream import mapped
+from appstream import sax
+from appstream.merge import merge_component, _Provenance
+from appstream.errors import ParseError, ValidationError
+from appstream.component import Component, _check_fields
+from appstream.search import SearchIndex
 
-from appstream.errors import ParseError
-from appstream.component import Component
+# facet name -> function returning the values of a component
+_FACETS = {
+    'category': lambda c: c.categories,
+    'keyword': lambda c: c.keywords,
+    'kind': lambda c: [c.kind],
+    'project_license': lambda c: [c.project_license],
+    'developer_name': lambda c: [c.developer_name],
+}
+
+def _parse_metainfo(filename):
+    """ Parse a MetaInfo file, returning (filename, component, error) """
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        component = Component()
+        component.parse(data)
+    except (ParseError, IOError, OSError) as e:
+        return (filename, None, str(e))
+    return (filename, component, None)
+
+def merge_stores(stores, origin=None):
+    """ Returns a new store from a list of (store, priority) tuples """
+    merged = Store(origin)
+    for store, priority in stores:
+        merged.merge(store, priority)
+    return merged
+
+def _provide_key(kind, value):
+    """ Returns the key of a provide in the index """
+    # firmware GUIDs are not case sensitive, and are parsed as lowercase
+    if kind == 'firmware-flashed' and value:
+        value = value.lower()
+    return (kind, value)
+
+def _check_backend(backend):
+    if backend not in ('etree', 'expat'):
+        raise ValueError('Unknown parser backend %s' % backend)
+
+def _validate_component(component):
+    """ Validate a component, returning the error messages """
+    return [str(e) for e in component.get_validation_errors()]
 
 class Store(object):
     """ A quick'n'dirty store """
@@ -38,32 +84,211 @@ class Store(object):
         """ Set defaults """
         self.origin = origin
         self.components = {}
+        self._provides = {}
+        self._checksums = {}
+        self._facets = {}
+        for facet in _FACETS:
+            self._facets[facet] = {}
+        self._search = SearchIndex()
+        self.origins = {}
+        self._priorities = {}
+        self._validation_cache = {}
 
     def to_xml(self):
-        xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        xml = ['<?xml version="1.0" encoding="UTF-8"?>\n']
         if len(self.components) == 0:
             return '<components version="0.9" origin="%s"/>\n' % self.origin
-        xml += '<components version="0.9" origin="%s">\n' % self.origin
+        xml.append('<components version="0.9" origin="%s">\n' % self.origin)
         for app_id in self.components:
-            xml += self.components[app_id].to_xml()
-        xml += '</components>\n'
-        return xml
+            xml.append(self.components[app_id].to_xml())
+        xml.append('</components>\n')
+        return ''.join(xml)
 
-    def to_file(self, filename):
-        """ Save the store to disk """
+    def to_fileobj(self, f):
+        """ Write the store as UTF-8 to a binary file-like object """
+
+        # each component is written as soon as it has been serialized
+        if len(self.components) == 0:
+            f.write(self.to_xml().encode('utf-8'))
+            return
+        f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(('<components version="0.9" origin="%s">\n' % self.origin).encode('utf-8'))
+        for app_id in self.components:
+            f.write(self.components[app_id].to_xml().encode('utf-8'))
+        f.write(b'</components>\n')
+
+    def to_file(self, filename, index=False):
+        """ Save the store to disk
+
+        If index is True an index is also saved, so that single components
+        can be read back quickly using IndexedStore.
+        """
+        if index:
+            gzindex.write(self, filename)
+            return
+
+        # an index left from an earlier save would no longer match
+        try:
+            os.remove(gzindex.index_filename(filename))
+        except OSError:
+            pass
 
         # save compressed file
-        xml = self.to_xml()
         f = gzip.open(filename, 'wb')
         try:
-            f.write(xml.encode('utf-8'))
+            self.to_fileobj(f)
         finally:
             f.close()
 
-    def from_file(self, filename):
-        """ Open the store from disk """
+    def to_mapped_file(self, filename):
+        """ Save the store to disk in a format that can be opened by MappedStore """
+        mapped.write(self, filename)
+
+    def from_file(self, filename, cache_dir=None, backend='etree', fields=None):
+        """ Open the store from disk
+
+        If cache_dir is set then a binary image of the parsed store is saved
+        there, and used instead of parsing the file if it is unchanged. The
+        cached store always has every field, so fields is then ignored.
+        The backend and fields are as for parse().
+        """
+        if not cache_dir:
+            for component in self.iter_file(filename, backend, fields):
+                self._replace(component)
+            return
+
+        # load from the cache, or parse into a new store to be cached
+        state = cache.load(filename, cache_dir)
+        if state is None:
+            header = cache.header(filename)
+            tmp = Store()
+            tmp.from_file(filename, backend=backend)
+            state = tmp.__dict__
+            cache.save(filename, cache_dir, state, header)
+
+        # the indexes can be used as-is if nothing else is in the store
+        if len(self.components) == 0:
+            self.__dict__.update(state)
+            return
+        self.origin = state['origin']
+        for component in state['components'].values():
+            self._replace(component)
+
+    def iter_file(self, filename, backend='etree', fields=None):
+        """ Yields each component from a file on disk as it is parsed """
+        _check_backend(backend)
+        fields = _check_fields(fields)
         with gzip.open(filename, 'rb') as f:
-            self.parse(f.read())
+            if backend == 'expat':
+                for component in self._iterparse_expat(f, fields):
+                    yield component
+                return
+            for component in self._iterparse(f, fields):
+                yield component
+
+    def _iterparse_expat(self, f, fields=None):
+        """ Incrementally parse components from a file object using expat """
+        parser = sax.Parser(fields=fields)
+        for component in sax.iterparse(f, parser):
+            if parser.root_attrib is not None:
+                self.origin = parser.root_attrib.get('origin')
+            yield component
+        if parser.root_attrib is not None:
+            self.origin = parser.root_attrib.get('origin')
+
+    def _iterparse(self, f, fields=None):
+        """ Incrementally parse components from a file object """
+
+        # only the <component> being parsed is kept in memory, as each
+        # one is cleared from the tree as soon as it has been consumed
+        depth = 0
+        root = None
+        for event, elem in etree.iterparse(f):
+            if event == 'start':
+                if depth == 0:
+                    root = elem
+                    self.origin = root.attrib.get('origin')
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            component = Component()
+            component.parse(elem, fields)
+            elem.clear()
+            root.clear()
+            yield component
+
+    def add_files(self, filenames, workers=1):
+        """ Parse MetaInfo files and add the components to the store
+
+        If workers is greater than one the files are parsed in a pool of
+        processes. Files that cannot be parsed do not stop the others being
+        added, and are returned as a dict of filename -> ParseError.
+        """
+        if workers > 1:
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.imap(_parse_metainfo, filenames, chunksize=16)
+                return self._add_parsed(results)
+            finally:
+                pool.close()
+                pool.join()
+        return self._add_parsed(_parse_metainfo(fn) for fn in filenames)
+
+    def _add_parsed(self, results):
+        """ Add the results of _parse_metainfo in order """
+        failed = {}
+        for filename, component, error in results:
+            if error:
+                failed[filename] = ParseError(error)
+                continue
+            self.add(component)
+        return failed
+
+    def from_directory(self, path, pattern='*.metainfo.xml', workers=1):
+        """ Add all the MetaInfo files in a directory tree to the store """
+        filenames = []
+        for dirpath, _, files in os.walk(path):
+            for fn in fnmatch.filter(files, pattern):
+                filenames.append(os.path.join(dirpath, fn))
+        return self.add_files(sorted(filenames), workers=workers)
+
+    def validate_all(self, workers=1):
+        """ Validate every component, returning all the problems found
+
+        The result is a dict of app_id -> list of ValidationError, only
+        including components that failed. Results are cached by the content
+        hash of each component, so unchanged components are not validated
+        again. If workers is greater than one then a pool of processes is
+        used.
+        """
+        todo = {}
+        for app_id in self.components:
+            component = self.components[app_id]
+            if component.get_hash() not in self._validation_cache:
+                todo[component.get_hash()] = component
+        if todo:
+            hashes = list(todo)
+            components = [todo[csum] for csum in hashes]
+            if workers > 1:
+                pool = multiprocessing.Pool(workers)
+                try:
+                    results = pool.map(_validate_component, components, chunksize=16)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                results = [_validate_component(c) for c in components]
+            for csum, messages in zip(hashes, results):
+                self._validation_cache[csum] = messages
+
+        report = {}
+        for app_id in self.components:
+            messages = self._validation_cache[self.components[app_id].get_hash()]
+            if messages:
+                report[app_id] = [ValidationError(msg) for msg in messages]
+        return report
 
     def get_component(self, app_id):
         """ Finds an application from the store """
@@ -78,28 +303,203 @@ class Store(object):
             components.append(self.components[app_id])
         return components
 
+    def iter_components(self):
+        """ Yields all the applications from the store """
+        for app_id in self.components:
+            yield self.components[app_id]
+
+    def get_components_by_provide(self, kind, value):
+        """ Returns all the applications with a specific provide """
+        return list(self._provides.get(_provide_key(kind, value), []))
+
+    def get_release_by_checksum(self, value, target=None, kind=None):
+        """ Returns a (component, release) tuple for a checksum value """
+        for component, release, csum in self._checksums.get(value, []):
+            if target and csum.target != target:
+                continue
+            if kind and csum.kind != kind:
+                continue
+            return (component, release)
+        return None
+
+    def get_components_by_facet(self, **facets):
+        """ Returns the applications matching all of the facets
+
+        Each keyword argument is a facet name, e.g. 'category' or 'keyword',
+        and either a single value or a list of values where any may match.
+        """
+        ids = None
+        for facet in facets:
+            if facet not in self._facets:
+                raise ValueError('Unknown facet %s' % facet)
+            values = facets[facet]
+            if not isinstance(values, (list, tuple, set, frozenset)):
+                values = [values]
+            matches = set()
+            for value in values:
+                matches.update(self._facets[facet].get(value, ()))
+            if ids is None:
+                ids = matches
+            else:
+                ids &= matches
+            if not ids:
+                return []
+        if ids is None:
+            return self.get_components()
+        return [self.components[app_id] for app_id in ids]
+
+    def search(self, query):
+        """ Returns the applications matching a search query, best first """
+        return [self.components[app_id] for _, app_id in self._search.search(query)]
+
+    def diff(self, other):
+        """ Returns a delta of the changes needed to turn this store into other
+
+        The delta is a dict of added, removed and changed components, where
+        changes are recorded down to individual releases, reviews and
+        checksums; see appstream/delta.py for the layout.
+        """
+        return _delta.diff(self, other)
+
+    def apply(self, delta):
+        """ Apply a delta from Store.diff() to the store """
+        self.origin = delta['origin']
+        for app_id in delta['removed']:
+            component = self.components.pop(app_id, None)
+            if component:
+                self._unindex(component)
+        for app_id in delta['changed']:
+            component = self.components.get(app_id)
+            if not component:
+                continue
+            self._unindex(component)
+            _delta.apply_component(component, delta['changed'][app_id])
+            self._index(component)
+        for component in delta['added']:
+            self._replace(copy.deepcopy(component))
+
+    def merge(self, other, priority=0):
+        """ Merge the components of another store into this one
+
+        Conflicting values are resolved field by field, and the value from
+        the store with the higher priority wins; on a tie the value already
+        in the store is kept. Releases, checksums, reviews and screenshots
+        are de-duplicated, and the origin of each merged value is recorded
+        in self.origins[app_id].
+        """
+        for app_id in other.components:
+            new = copy.deepcopy(other.components[app_id])
+            prov = _Provenance(self.origins.setdefault(app_id, {}),
+                               self._priorities.setdefault(app_id, {}),
+                               other.origin, priority)
+            old = self.components.get(app_id)
+            if old:
+                self._unindex(old)
+                merge_component(old, new, prov)
+                self._index(old)
+                continue
+            component = Component()
+            component.id = app_id
+            merge_component(component, new, prov)
+            self._replace(component)
+
     def add(self, component):
         """ Add component to the store """
 
         # if already exists, just add the release objects
         old = self.get_component(component.id)
         if old:
-            old.releases.extend(component.releases)
+            for rel in component.releases:
+                if old.get_release_by_version(rel.version):
+                    continue
+                old.add_release(rel)
+                self._index_release(old, rel)
             return
         self.components[component.id] = component
+        self._index(component)
+
+    def _replace(self, component):
+        """ Add component to the store, replacing any with the same ID """
+        old = self.get_component(component.id)
+        if old:
+            self._unindex(old)
+        self.components[component.id] = component
+        self._index(component)
 
-    def parse(self, xml_data):
-        """ Parse XML data """
+    def _index(self, component):
+        """ Add a component to the lookup indexes """
+        for p in component.provides:
+            self._provides.setdefault(_provide_key(p.kind, p.value), []).append(component)
+        for rel in component.releases:
+            self._index_release(component, rel)
+        for facet in _FACETS:
+            index = self._facets[facet]
+            for value in _FACETS[facet](component):
+                if value is None:
+                    continue
+                index.setdefault(value, set()).add(component.id)
+        self._search.add(component)
+
+    def _index_release(self, component, release):
+        """ Add a release to the checksum index """
+        for csum in release.checksums:
+            self._checksums.setdefault(csum.value, []).append((component, release, csum))
+
+    def _unindex(self, component):
+        """ Remove a component from the lookup indexes """
+        for p in component.provides:
+            key = _provide_key(p.kind, p.value)
+            components = self._provides.get(key, [])
+            if component in components:
+                components.remove(component)
+            if not components:
+                self._provides.pop(key, None)
+        for rel in component.releases:
+            for csum in rel.checksums:
+                items = [i for i in self._checksums.get(csum.value, []) if i[0] is not component]
+                if items:
+                    self._checksums[csum.value] = items
+                else:
+                    self._checksums.pop(csum.value, None)
+        for facet in _FACETS:
+            index = self._facets[facet]
+            for value in _FACETS[facet](component):
+                ids = index.get(value)
+                if ids is None:
+                    continue
+                ids.discard(component.id)
+                if not ids:
+                    del index[value]
+        self._search.remove(component)
+
+    def parse(self, xml_data, backend='etree', fields=None):
+        """ Parse XML data
+
+        The backend can be 'etree' to build an ElementTree and then walk it,
+        or 'expat' to build the components directly from the parser events
+        without holding a tree of the whole document in memory. Both give
+        identical results.
+
+        If fields is set only those attributes of each component are parsed,
+        e.g. fields=['provides', 'releases'], which is much faster if the
+        descriptions, reviews and screenshots are not needed. The id is
+        always parsed.
+        """
+        _check_backend(backend)
+        fields = _check_fields(fields)
+        if backend == 'expat':
+            parser = sax.parse(xml_data, fields=fields)
+            self.origin = parser.root_attrib['origin']
+            for component in parser.components:
+                self._replace(component)
+            return
 
         # parse tree
-        try:
-            root = ET.fromstring(xml_data)
-        except StdlibParseError as e:
-            raise ParseError(str(e))
+        root = etree.fromstring(xml_data)
 
         self.origin = root.attrib['origin']
 
         for child in root:
             component = Component()
-            component.parse(child)
-            self.components[component.id] = component
+            component.parse(child, fields)
+            self._replace(component)
@@ -18,56 +18,202 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 # MA 02110-1301, USA
 
-import xml.etree.ElementTree as ET
+import calendar
+import re
+import sys
 
-try:
-    # Py2.7 and newer
-    from xml.etree.ElementTree import ParseError as StdlibParseError
-except ImportError:
-    # Py2.6 and older
-    from xml.parsers.expat import ExpatError as StdlibParseError
+from collections import OrderedDict
+from datetime import datetime
 
+from appstream import etree
 from appstream.errors import ParseError
 
+if sys.version_info[0] == 2:
+    _intern_str = intern
+else:
+    _intern_str = sys.intern
+
+def _intern(txt):
+    """ Share one copy of a string from a small vocabulary """
+    if txt is None:
+        return None
+    try:
+        return _intern_str(txt)
+    except TypeError:
+        # Python2 cannot intern unicode objects
+        return txt
+
+def _parse_int(txt, base=10):
+    """ Convert the text of an attribute or element to an integer """
+    try:
+        return int(txt, base)
+    except (TypeError, ValueError):
+        raise ParseError('Invalid integer %s' % txt)
+
+class _LRUCache(object):
+    """ A dict-like cache that drops the least recently used entries """
+
+    def __init__(self, size):
+        self._size = size
+        self._data = OrderedDict()
+
+    def __getitem__(self, key):
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        if len(self._data) > self._size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+_DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})'
+                      r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?'
+                      r'(Z|[+-]\d{2}(?::?\d{2})?)?)?$')
+_DATE_CACHE = _LRUCache(4096)
+_VALIDATE_CACHE = _LRUCache(1024)
+_IMPORT_CACHE = _LRUCache(1024)
+
+def _parse_date_slow(txt):
+    """ Parse an unusual date using dateutil, if installed """
+    try:
+        import dateutil.parser
+    except ImportError:
+        raise ParseError('Unable to parse date %s' % txt)
+    try:
+        dt = dateutil.parser.parse(txt)
+    except (ValueError, OverflowError) as e:
+        raise ParseError('Unable to parse date %s: %s' % (txt, str(e)))
+    if dt.tzinfo:
+        return calendar.timegm(dt.utctimetuple())
+    return calendar.timegm(dt.timetuple())
+
+def _parse_date(txt):
+    """ Convert an ISO-8601 date to a UTC timestamp
+
+    Dates without a timezone are assumed to be UTC, so the result does not
+    depend on the local timezone.
+    """
+    try:
+        return _DATE_CACHE[txt]
+    except KeyError:
+        pass
+    m = _DATE_RE.match(txt.strip())
+    value = None
+    if m:
+        year, month, day, hour, minute, second, tz = m.groups()
+        try:
+            dt = datetime(int(year), int(month), int(day),
+                          int(hour or 0), int(minute or 0), int(second or 0))
+            value = calendar.timegm(dt.timetuple())
+        except ValueError:
+            pass
+        if value is not None and tz and tz != 'Z':
+            offset = int(tz[1:3]) * 3600 + int(tz[-2:] if len(tz) > 3 else 0) * 60
+            if tz[0] == '+':
+                value -= offset
+            else:
+                value += offset
+    if value is None:
+        value = _parse_date_slow(txt)
+    _DATE_CACHE[txt] = value
+    return value
+
+_VERSION_RE = re.compile(r'\d+|[a-zA-Z]+')
+
+def _version_key(version):
+    """ Returns a key that sorts versions in release order
+
+    Numeric parts compare as numbers and are newer than alphabetic parts,
+    so 1.10 > 1.9 and 1.0 > 1.0rc; a missing version sorts oldest.
+    """
+    if not version:
+        return ()
+    key = []
+    for part in _VERSION_RE.findall(version):
+        if part.isdigit():
+            key.append((2, int(part)))
+        else:
+            key.append((0, part))
+
+    # sorts after an alphabetic suffix but before any extra numeric part
+    key.append((1,))
+    return tuple(key)
+
+# slots holding back-references and caches rather than content
+_TRANSIENT_SLOTS = frozenset(['_parent', '_xml', '_hash'])
+
+def _canonical(value):
+    """ Returns a comparable, hashable representation of a model object """
+    if isinstance(value, (list, tuple)):
+        return tuple([_canonical(v) for v in value])
+    if isinstance(value, dict):
+        return tuple(sorted([(k, _canonical(value[k])) for k in value],
+                            key=lambda item: item[0]))
+    if hasattr(value, '__slots__'):
+        return (value.__class__.__name__,) + \
+            tuple([_canonical(getattr(value, s)) for s in value.__slots__
+                   if s not in _TRANSIENT_SLOTS])
+    return value
+
 def _join_lines(txt):
     """ Remove whitespace from XML input """
     txt = txt or ''  # Handle NoneType input values
-    val = ''
-    lines = txt.split('\n')
-    for line in lines:
-        stripped = line.strip()
-        if len(stripped) == 0:
-            continue
-        val += stripped + ' '
-    return val.strip()
+    return ' '.join([line.strip() for line in txt.split('\n') if line.strip()])
 
 def _parse_desc(node):
     """ A quick'n'dirty description parser """
-    desc = ''
     if len(node) == 0:
+        if node.text is None:
+            raise ParseError('Expected text or children in <%s>' % node.tag)
         return '<p>' + node.text + '</p>'
+    desc = []
     for n in node:
         if n.tag == 'p':
-            desc += '<p>' + _join_lines(n.text) + '</p>'
+            desc.append('<p>%s</p>' % _join_lines(n.text))
         elif n.tag == 'ol' or n.tag == 'ul':
-            desc += '<ul>'
+            desc.append('<ul>')
             for c in n:
                 if c.tag == 'li':
-                    desc += '<li>' + _join_lines(c.text) + '</li>'
+                    desc.append('<li>%s</li>' % _join_lines(c.text))
                 else:
                     raise ParseError('Expected <li> in <%s>, got <%s>' % (n.tag, c.tag))
-            desc += '</ul>'
+            desc.append('</ul>')
         else:
             raise ParseError('Expected <p>, <ul>, <ol> in <%s>, got <%s>' % (node.tag, n.tag))
-    return desc
+    return ''.join(desc)
 
 def validate_description(xml_data):
     """ Validate the description for validity """
     try:
-        root = ET.fromstring('<document>' + xml_data + '</document>')
-    except StdlibParseError as e:
-        raise ParseError(str(e))
-    return _parse_desc(root)
+        return _VALIDATE_CACHE[xml_data]
+    except KeyError:
+        pass
+    root = etree.fromstring('<document>' + xml_data + '</document>')
+    desc = _parse_desc(root)
+    _VALIDATE_CACHE[xml_data] = desc
+    return desc
+
+def validate_descriptions(descriptions):
+    """ Validate many descriptions, returning a list of the results
+
+    Each item is the normalized description, or the ParseError if it was
+    not valid.
+    """
+    results = []
+    for xml_data in descriptions:
+        try:
+            results.append(validate_description(xml_data))
+        except ParseError as e:
+            results.append(e)
+    return results
 
 def _import_description_to_list_element(text):
     if len(text) < 5:
@@ -83,7 +229,11 @@ def _import_description_sentence_case(text):
 
 def import_description(text):
     """ Convert ASCII text to AppStream markup format """
-    xml = ''
+    try:
+        return _IMPORT_CACHE[text]
+    except KeyError:
+        pass
+    xml = []
     is_in_ul = False
     for line in text.split('\n'):
 
@@ -97,21 +247,23 @@ def import_description(text):
         if line_li:
             # first list element
             if not is_in_ul:
-                xml += '<ul>\n'
+                xml.append('<ul>\n')
                 is_in_ul = True
-            xml += '<li>' + _import_description_sentence_case(line_li) + '</li>\n'
+            xml.append('<li>' + _import_description_sentence_case(line_li) + '</li>\n')
             continue
 
         # done with the list
         if is_in_ul:
-            xml += '</ul>\n'
+            xml.append('</ul>\n')
             is_in_ul = False
 
         # regular paragraph
-        xml += '<p>' + _import_description_sentence_case(line) + '</p>\n'
+        xml.append('<p>' + _import_description_sentence_case(line) + '</p>\n')
 
     # no trailing paragraph
     if is_in_ul:
-        xml += '</ul>\n'
+        xml.append('</ul>\n')
 
+    xml = ''.join(xml)
+    _IMPORT_CACHE[text] = xml
     return xml
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" Compare the parser backends on a synthetic catalog or a real one
+
+Every ElementTree implementation that is installed is timed, as well as
+the expat backend, and the components they produce are checked to be
+identical.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import appstream
+import appstream.etree
+from appstream.utils import _canonical
+from generator import generate
+
+def _parse(filename, implementation, backend):
+    """ Returns (time in seconds, canonical components) """
+    appstream.etree.use(implementation)
+    store = appstream.Store()
+    start = time.perf_counter()
+    store.from_file(filename, backend=backend)
+    elapsed = time.perf_counter() - start
+    return elapsed, dict([(c.id, _canonical(c)) for c in store.get_components()])
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare parser backends')
+    parser.add_argument('filename', nargs='?',
+                        help='a gzipped catalog, instead of a generated one')
+    parser.add_argument('--components', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = args.filename
+        if not filename:
+            filename = os.path.join(tmpdir, 'bench.xml.gz')
+            with gzip.open(filename, 'wb') as f:
+                f.write(generate(n_components=args.components).encode('utf-8'))
+        configs = [(name, 'etree') for name in appstream.etree.available()]
+        configs.append(('stdlib', 'expat'))
+        expected = None
+        for implementation, backend in configs:
+            best = None
+            for _ in range(args.repeat):
+                elapsed, components = _parse(filename, implementation, backend)
+                if best is None or elapsed < best:
+                    best = elapsed
+            if expected is None:
+                expected = components
+            elif components != expected:
+                print('MISMATCH: %s/%s gave different components' % (implementation, backend))
+                return 1
+            name = implementation if backend == 'etree' else backend
+            print('%-16s %9.2f ms %12.0f components/s' %
+                  (name, best * 1000, len(components) / best))
+    finally:
+        appstream.etree.use()
+        shutil.rmtree(tmpdir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
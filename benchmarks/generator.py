@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" Deterministic generator for synthetic AppStream catalogs """
+
+import hashlib
+import random
+
+_WORDS = ('firmware', 'update', 'device', 'fixes', 'support', 'improves',
+          'battery', 'display', 'colorimeter', 'bootloader', 'stability',
+          'security', 'performance', 'adds', 'new', 'features', 'usb', 'dock')
+_CATEGORIES = ('X-Device', 'X-Dock', 'X-Storage', 'X-Network', 'X-Audio')
+_LICENSES = ('proprietary', 'GPL-2.0+', 'LGPL-2.1+', 'CC0-1.0')
+_VENDORS = ('Hughski Limited', 'Example Corp', 'Acme Devices', 'Foo Systems')
+
+def _sentence(rnd, n_words):
+    words = [rnd.choice(_WORDS) for _ in range(n_words)]
+    return ' '.join(words).capitalize()
+
+def _description(rnd, n_lines):
+    """ Returns description markup with n_lines paragraphs and list items """
+    xml = ['<description>']
+    for i in range(n_lines):
+        if i % 4 == 3:
+            xml.append('<ul><li>%s</li><li>%s</li></ul>' %
+                       (_sentence(rnd, 4), _sentence(rnd, 5)))
+        else:
+            xml.append('<p>%s.</p>' % _sentence(rnd, 8))
+    xml.append('</description>')
+    return ''.join(xml)
+
+def _digest(*args):
+    return hashlib.sha1(('-'.join([str(a) for a in args])).encode('utf-8')).hexdigest()
+
+def generate(n_components=1000, n_releases=5, n_checksums=2, n_reviews=1,
+             n_screenshots=1, desc_lines=4, seed=0):
+    """ Returns the XML of a synthetic store
+
+    The same arguments always produce the same document.
+    """
+    rnd = random.Random(seed)
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+           '<components version="0.9" origin="bench">\n']
+    for i in range(n_components):
+        xml.append('<component type="firmware">\n')
+        xml.append('<id>com.example.Device%i.firmware</id>\n' % i)
+        xml.append('<name>Device %i</name>\n' % i)
+        xml.append('<summary>%s</summary>\n' % _sentence(rnd, 6))
+        xml.append(_description(rnd, desc_lines) + '\n')
+        xml.append('<metadata_license>CC0-1.0</metadata_license>\n')
+        xml.append('<project_license>%s</project_license>\n' % rnd.choice(_LICENSES))
+        xml.append('<developer_name>%s</developer_name>\n' % rnd.choice(_VENDORS))
+        xml.append('<url type="homepage">http://example.com/%i</url>\n' % i)
+        xml.append('<categories><category>%s</category></categories>\n' % rnd.choice(_CATEGORIES))
+        xml.append('<keywords><keyword>%s</keyword><keyword>%s</keyword></keywords>\n' %
+                   (rnd.choice(_WORDS), rnd.choice(_WORDS)))
+        xml.append('<provides><firmware type="flashed">%s</firmware></provides>\n' %
+                   guid(i))
+        xml.append('<requires><id compare="ge" version="1.0.%i">org.freedesktop.fwupd</id></requires>\n' %
+                   rnd.randint(0, 9))
+        xml.append('<releases>\n')
+        for j in range(n_releases):
+            xml.append('<release version="%i.%i.%i" date="20%02i-%02i-%02i" urgency="%s">\n' %
+                       (1 + j // 100, (j // 10) % 10, j % 10, 10 + j % 10,
+                        1 + j % 12, 1 + j % 28,
+                        rnd.choice(('low', 'medium', 'high', 'critical'))))
+            for k in range(n_checksums):
+                xml.append('<checksum target="%s" filename="f%i.bin" type="sha1">%s</checksum>\n' %
+                           (('container', 'content', 'signature', 'device')[k % 4],
+                            k, checksum(i, j, k)))
+            xml.append('<size type="download">%i</size>\n' % rnd.randint(1000, 1000000))
+            xml.append(_description(rnd, max(1, desc_lines // 2)) + '\n')
+            xml.append('</release>\n')
+        xml.append('</releases>\n')
+        if n_reviews:
+            xml.append('<reviews>\n')
+            for j in range(n_reviews):
+                xml.append('<review date="2016-09-%02i" rating="%i" id="%i-%i">'
+                           '<summary>%s</summary>%s<version>1.0.%i</version>'
+                           '<reviewer_name>Reviewer %i</reviewer_name><lang>en_GB</lang>'
+                           '</review>\n' %
+                           (1 + j % 28, rnd.randint(0, 100), i, j, _sentence(rnd, 3),
+                            _description(rnd, 1), j, j))
+            xml.append('</reviews>\n')
+        if n_screenshots:
+            xml.append('<screenshots>\n')
+            for j in range(n_screenshots):
+                xml.append('<screenshot type="%s">'
+                           '<image type="source">http://example.com/%i/%i.png</image>'
+                           '<image type="thumbnail" width="624" height="351">http://example.com/%i/%i-t.png</image>'
+                           '<caption><p>%s</p></caption></screenshot>\n' %
+                           ('default' if j == 0 else 'normal', i, j, i, j, _sentence(rnd, 4)))
+            xml.append('</screenshots>\n')
+        xml.append('</component>\n')
+    xml.append('</components>\n')
+    return ''.join(xml)
+
+def guid(i):
+    """ Returns the provided GUID of generated component i """
+    value = _digest('guid', i)
+    return '%s-%s-%s-%s-%s' % (value[0:8], value[8:12], value[12:16], value[16:20], value[20:32])
+
+def checksum(i, j, k):
+    """ Returns checksum k of release j of generated component i """
+    return _digest('csum', i, j, k)
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" Measure the memory used by each component of a large parsed store """
+
+from __future__ import print_function
+
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import appstream
+from generator import generate
+
+def main():
+    n_components = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_releases = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    xml = generate(n_components=n_components, n_releases=n_releases)
+
+    gc.collect()
+    tracemalloc.start()
+    components = []
+    store = appstream.Store()
+    store.parse(xml)
+    for component in store.get_components():
+        components.append(component)
+    store = None
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('%i components, %i releases each' % (n_components, n_releases))
+    print('%.1f MiB total, %i bytes per component' %
+          (current / 1024.0 / 1024.0, current // n_components))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Richard Hughes <richard@hughsie.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA
+
+""" Time the main parse, serialize, validate and lookup paths
+
+Run with --save to record the results as the baseline for this machine,
+and without to compare against it; slowdowns over the threshold are
+reported as regressions and make the script exit with an error.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import appstream
+from generator import generate, guid, checksum
+
+_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def _measure(func, repeat, trace_memory):
+    """ Returns (best time in seconds, peak memory in bytes) """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    peak = 0
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return best, peak
+
+def _benchmarks(args, tmpdir):
+    """ Returns a list of (name, function, number of items processed) """
+    xml = generate(n_components=args.components, n_releases=args.releases,
+                   n_checksums=args.checksums, n_reviews=args.reviews,
+                   n_screenshots=args.screenshots, desc_lines=args.desc_lines,
+                   seed=args.seed)
+    filename = os.path.join(tmpdir, 'bench.xml.gz')
+    store = appstream.Store()
+    store.parse(xml)
+    store.to_file(filename)
+    indexed_filename = os.path.join(tmpdir, 'indexed.xml.gz')
+    store.to_file(indexed_filename, index=True)
+    components = store.get_components()
+    n = len(components)
+    lookups = 1000
+    app_ids = ['com.example.Device%i.firmware' % (i % n) for i in range(lookups)]
+    guids = [guid(i % n) for i in range(lookups)]
+    checksums = [checksum(i % n, 0, 0) for i in range(lookups)]
+    queries = ['device%i' % i for i in range(lookups // 10)]
+    projection = ['id', 'provides', 'releases']
+
+    def parse():
+        appstream.Store().parse(xml)
+
+    def parse_expat():
+        appstream.Store().parse(xml, backend='expat')
+
+    def parse_projected():
+        appstream.Store().parse(xml, fields=projection)
+
+    def parse_projected_expat():
+        appstream.Store().parse(xml, backend='expat', fields=projection)
+
+    def from_file():
+        appstream.Store().from_file(filename)
+
+    def from_file_expat():
+        appstream.Store().from_file(filename, backend='expat')
+
+    def to_xml():
+        for component in components:
+            component.invalidate()
+        store.to_xml()
+
+    def to_file():
+        for component in components:
+            component.invalidate()
+        store.to_file(os.path.join(tmpdir, 'out.xml.gz'))
+
+    def validate():
+        for component in components:
+            component.get_validation_errors()
+
+    def get_component():
+        for app_id in app_ids:
+            store.get_component(app_id)
+
+    def get_components_by_provide():
+        for value in guids:
+            store.get_components_by_provide('firmware-flashed', value)
+
+    def get_release_by_checksum():
+        for value in checksums:
+            store.get_release_by_checksum(value)
+
+    def indexed_get_component():
+        with appstream.IndexedStore(indexed_filename) as istore:
+            for app_id in app_ids:
+                istore.get_component(app_id)
+
+    def search():
+        for query in queries:
+            store.search(query)
+
+    return [
+        ('Store.parse', parse, n),
+        ('Store.parse (expat)', parse_expat, n),
+        ('Store.parse (projected)', parse_projected, n),
+        ('Store.parse (projected, expat)', parse_projected_expat, n),
+        ('Store.from_file', from_file, n),
+        ('Store.from_file (expat)', from_file_expat, n),
+        ('Store.to_xml', to_xml, n),
+        ('Store.to_file', to_file, n),
+        ('Component.validate', validate, n),
+        ('Store.get_component', get_component, lookups),
+        ('Store.get_components_by_provide', get_components_by_provide, lookups),
+        ('Store.get_release_by_checksum', get_release_by_checksum, lookups),
+        ('Store.search', search, len(queries)),
+        ('IndexedStore.get_component', indexed_get_component, lookups),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark python-appstream')
+    parser.add_argument('--components', type=int, default=2000)
+    parser.add_argument('--releases', type=int, default=5)
+    parser.add_argument('--checksums', type=int, default=2)
+    parser.add_argument('--reviews', type=int, default=1)
+    parser.add_argument('--screenshots', type=int, default=1)
+    parser.add_argument('--desc-lines', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not measure peak memory, which is slow')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--baseline', default=_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        results = {}
+        for name, func, items in _benchmarks(args, tmpdir):
+            elapsed, peak = _measure(func, args.repeat, not args.no_memory)
+            results[name] = {'seconds': elapsed, 'peak_bytes': peak}
+            print('%-36s %9.2f ms %12.0f items/s %9.1f MiB' %
+                  (name, elapsed * 1000, items / elapsed, peak / 1024.0 / 1024.0))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    # the baseline is only valid for the same catalog shape
+    config = dict([(k, v) for k, v in vars(args).items()
+                   if k in ('components', 'releases', 'checksums', 'reviews',
+                            'screenshots', 'desc_lines', 'seed')])
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2, sort_keys=True)
+        print('Saved baseline to %s' % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['config'] != config:
+        print('Baseline was recorded with a different configuration, not comparing')
+        return 0
+    regressions = 0
+    for name in sorted(results):
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]['seconds']
+        new = results[name]['seconds']
+        if new > old * (1 + args.threshold):
+            print('REGRESSION: %s took %.2f ms, baseline %.2f ms' %
+                  (name, new * 1000, old * 1000))
+            regressions += 1
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
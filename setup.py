@@ -51,6 +51,7 @@ setup(
         "Topic :: Text Processing :: Markup :: XML",
     ],
     install_requires=requires,
+    extras_require={'lxml': ['lxml']},
     packages=['appstream'],
     include_package_data=True,
     zip_safe=False,
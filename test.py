@@ -20,7 +20,17 @@
 
 from __future__ import print_function
 
+import io
+import os
+import pickle
+import shutil
+import tempfile
+
 import appstream
+import appstream.cache
+import appstream.etree
+import appstream.gzindex
+import appstream.profiling
 
 def main():
 
@@ -49,6 +59,23 @@ Enhancemets:
     print(xml)
     assert appstream.utils.validate_description(xml)
 
+    # validate many descriptions
+    res = appstream.utils.validate_descriptions([xml, '<p>one</p>', '<q>junk</q>', xml])
+    assert res[0] == res[3] == appstream.utils.validate_description(xml), res
+    assert res[1] == '<p>one</p>', res
+    assert isinstance(res[2], appstream.ParseError), res
+
+    # parse dates
+    assert appstream.utils._parse_date('2016-02-25') == 1456358400
+    assert appstream.utils._parse_date('2016-02-25T01:02:03Z') == 1456362123
+    assert appstream.utils._parse_date('2016-02-25T01:02:03+01:00') == 1456358523
+    assert appstream.utils._parse_date('2016-02-25 01:02') == 1456362120
+    try:
+        appstream.utils._parse_date('2016-02-30')
+        assert False
+    except (appstream.ParseError, ValueError):
+        pass
+
     # parse junk
     app = appstream.Component()
     try:
@@ -179,7 +206,8 @@ Enhancemets:
         assert rev.karma == -1, rev.karma
         assert rev.score == 5, rev.score
         assert rev.rating == 80, rev.rating
-        assert rev.date == 1473894000, rev.date
+        assert rev.date == 1473897600, rev.date
+        assert ' date="2016-09-15T00:00:00"' in rev.to_xml(), rev.to_xml()
         assert len(rev.metadata) == 1
         assert rev.metadata['foo'] == 'bar', rev.metadata
 
@@ -202,6 +230,46 @@ Enhancemets:
     ss = app.screenshots[1]
     assert ss.caption == '<p>No markup</p>', ss.caption
 
+    # evaluate requirements
+    ev = appstream.RequirementEvaluator([app])
+    inventory = {
+        'org.freedesktop.fwupd': '0.8.10',
+        'bootloader': 'BOT03.01_B',
+        'vendor-id': 'USB:0x046X',
+    }
+    res = ev.evaluate(inventory)
+    assert list(res) == ['com.hughski.ColorHug.firmware'], res
+    assert res['com.hughski.ColorHug.firmware'] == app.releases
+    inventory['com.hughski.ColorHug.firmware'] = '1.2.4'
+    assert ev.evaluate(inventory) == {'com.hughski.ColorHug.firmware': []}
+    inventory['org.freedesktop.fwupd'] = '0.8.1'
+    assert ev.evaluate(inventory) == {}
+    inventory['org.freedesktop.fwupd'] = '0.9'
+    inventory['bootloader'] = 'BOT03.02_B'
+    assert list(ev.evaluate_many([inventory])) == [{}]
+    inventory['bootloader'] = 'BOT03.01_B'
+    inventory['vendor-id'] = 'USB:0x46X'
+    assert ev.evaluate(inventory) == {}, ev.evaluate(inventory)
+
+    # only plain dotted numbers are compared by key for eq and ne
+    req = appstream.Require()
+    req.kind = 'id'
+    req.value = 'org.freedesktop.fwupd'
+    req.compare = 'eq'
+    req.version = '1.0'
+    app_eq = appstream.Component()
+    app_eq.id = 'org.example.Eq'
+    app_eq.add_require(req)
+    ev = appstream.RequirementEvaluator([app_eq])
+    for version, expected in [('1.0', True), ('1.00', True), ('1-0', False),
+                              ('1.0.0', False), ('1.0a', False)]:
+        res = ev.evaluate({'org.freedesktop.fwupd': version})
+        assert ('org.example.Eq' in res) == expected, version
+    req.compare = 'ne'
+    ev = appstream.RequirementEvaluator([app_eq])
+    assert 'org.example.Eq' in ev.evaluate({'org.freedesktop.fwupd': '1-0'})
+    assert 'org.example.Eq' not in ev.evaluate({'org.freedesktop.fwupd': '1.0'})
+
     # custom metadata
     assert 'foo' in app.custom, app.custom
     assert app.custom['foo'] == 'bar', app.custom
@@ -241,10 +309,593 @@ Enhancemets:
     app = appstream.Component()
     app.parse(data)
     store.add(app)
+    store.add(app)
+    app = store.get_component('com.hughski.ColorHug.firmware')
+    assert [rel.version for rel in app.releases] == ['1.2.5', '1.2.4'], app.releases
     print(store.to_xml().encode('utf-8'))
 
+    # releases are kept in version order
+    app = appstream.Component()
+    for version in ['1.9', '1.10', '1.0', '1.0rc1', '1.9']:
+        rel = appstream.Release()
+        rel.version = version
+        app.add_release(rel)
+    versions = [rel.version for rel in app.releases]
+    assert versions == ['1.10', '1.9', '1.0', '1.0rc1'], versions
+    app.releases = list(reversed(app.releases))
+    assert app.get_release_latest().version == '1.10'
+
     store.to_file('/tmp/firmware.xml.gz')
 
+    # write to a file object
+    f = io.BytesIO()
+    store.to_fileobj(f)
+    assert f.getvalue() == store.to_xml().encode('utf-8')
+
+    # load back from disk
+    store = appstream.Store()
+    store.from_file('/tmp/firmware.xml.gz')
+    assert len(store.components) == 1, store.components
+    app = store.get_component('com.hughski.ColorHug.firmware')
+    assert app.name == 'ColorHug Device Update', app.name
+    assert len(app.releases) == 2, app.releases
+    assert app.get_release_latest().version == '1.2.5', app.releases
+    rel = app.get_release_by_version('1.2.4')
+    assert len(rel.checksums) == 2, rel.checksums
+    assert app.get_release_by_version('1.2.3') is None
+
+    # look up by provide
+    apps = store.get_components_by_provide('firmware-flashed',
+                                           '40338ceb-b966-4eae-adae-9c32edfcc484')
+    assert apps == [app], apps
+    apps = store.get_components_by_provide('firmware-flashed',
+                                           '40338CEB-B966-4EAE-ADAE-9C32EDFCC484')
+    assert apps == [app], apps
+    apps = store.get_components_by_provide('firmware-flashed', 'unknown')
+    assert apps == [], apps
+
+    # look up by checksum
+    res = store.get_release_by_checksum('beefdead')
+    assert res == (app, app.get_release_by_version('1.2.4')), res
+    res = store.get_release_by_checksum('deadbeef', target='container')
+    assert res[1].version == '1.2.4', res
+    assert store.get_release_by_checksum('deadbeef', target='content') is None
+
+    # look up by facet
+    apps = store.get_components_by_facet(kind='firmware', keyword=['one', 'three'])
+    assert apps == [app], apps
+    apps = store.get_components_by_facet(kind='firmware', keyword='three')
+    assert apps == [], apps
+    apps = store.get_components_by_facet(developer_name='Hughski Limited')
+    assert apps == [app], apps
+
+    # full-text search
+    apps = store.search('colorh')
+    assert apps == [app], apps
+    apps = store.search('Colorimeter ONE')
+    assert apps == [app], apps
+    apps = store.search('para')
+    assert apps == [app], apps
+    apps = store.search('colorhug missing')
+    assert apps == [], apps
+
+    # load using a cache
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for i in range(2):
+            store = appstream.Store()
+            store.from_file('/tmp/firmware.xml.gz', cache_dir=cache_dir)
+            assert len(os.listdir(cache_dir)) == 1, os.listdir(cache_dir)
+            app = store.get_component('com.hughski.ColorHug.firmware')
+            assert len(app.releases) == 2, app.releases
+            assert store.get_release_by_checksum('beefdead') == (app, app.releases[1])
+
+        # an unchanged file with a new mtime updates the image header
+        st = os.stat('/tmp/firmware.xml.gz')
+        os.utime('/tmp/firmware.xml.gz', (st.st_atime, st.st_mtime + 10))
+        assert appstream.cache.load('/tmp/firmware.xml.gz', cache_dir) is not None
+        with open(appstream.cache._cache_filename(cache_dir, '/tmp/firmware.xml.gz'), 'rb') as f:
+            header = pickle.load(f)
+        assert header['mtime'] == st.st_mtime + 10, header
+        assert len(os.listdir(cache_dir)) == 1, os.listdir(cache_dir)
+
+        # a file replaced while it was parsed is not served from the image
+        header = appstream.cache.header('/tmp/firmware.xml.gz')
+        shutil.copyfile('/tmp/firmware.xml.gz', '/tmp/firmware-old.xml.gz')
+        tmp = appstream.Store()
+        tmp.origin = 'replaced'
+        tmp.to_file('/tmp/firmware.xml.gz')
+        tmp = appstream.Store()
+        tmp.from_file('/tmp/firmware.xml.gz')
+        appstream.cache.save('/tmp/firmware.xml.gz', cache_dir, tmp.__dict__, header)
+        assert appstream.cache.load('/tmp/firmware.xml.gz', cache_dir) is None
+        shutil.move('/tmp/firmware-old.xml.gz', '/tmp/firmware.xml.gz')
+        assert appstream.cache.load('/tmp/firmware.xml.gz', cache_dir) is not None
+    finally:
+        shutil.rmtree(cache_dir)
+
+    # random access from a mapped file
+    store.to_mapped_file('/tmp/firmware.map')
+    with appstream.MappedStore('/tmp/firmware.map') as mstore:
+        assert len(mstore) == 1, len(mstore)
+        assert mstore.get_component('unknown') is None
+        app = mstore.get_component('com.hughski.ColorHug.firmware')
+        assert app.name == 'ColorHug Device Update', app.name
+        assert len(app.releases) == 2, app.releases
+        assert len(mstore.get_components()) == 1
+
+    # random access from an indexed gzip file
+    store2 = appstream.Store('indexed')
+    store2.add(store.get_component('com.hughski.ColorHug.firmware'))
+    for i in range(3):
+        app = appstream.Component()
+        app.id = 'com.example.Device%i.firmware' % i
+        app.name = 'Device %i' % i
+        store2.add(app)
+    for block_size in [0, appstream.gzindex.BLOCK_SIZE]:
+        appstream.gzindex.write(store2, '/tmp/indexed.xml.gz', block_size)
+        store = appstream.Store()
+        store.from_file('/tmp/indexed.xml.gz')
+        assert sorted(store.components) == sorted(store2.components), store.components
+        assert store.origin == 'indexed', store.origin
+        with appstream.IndexedStore('/tmp/indexed.xml.gz') as istore:
+            assert len(istore) == 4, len(istore)
+            assert istore.origin == 'indexed', istore.origin
+            assert istore.get_component('unknown') is None
+            app = istore.get_component('com.example.Device2.firmware')
+            assert app.name == 'Device 2', app.name
+            app = istore.get_component('com.hughski.ColorHug.firmware', fields=['releases'])
+            assert len(app.releases) == 2 and app.name is None, app.releases
+            assert [c.id for c in istore.get_components()] == list(store2.components)
+            xml = store2.to_xml().encode('utf-8')
+            assert istore.read(0, len(xml)) == xml
+            assert istore.read(100, 20) == xml[100:120]
+    store2.to_file('/tmp/indexed.xml.gz', index=True)
+    with open('/tmp/indexed.xml.gz', 'ab') as f:
+        f.write(b'\0')
+    try:
+        appstream.IndexedStore('/tmp/indexed.xml.gz')
+        assert False
+    except appstream.ParseError:
+        pass
+
+    # a file rewritten with the same size is detected too
+    store2.to_file('/tmp/indexed.xml.gz', index=True)
+    store2.components['com.example.Device2.firmware'].name = 'Device X'
+    store2.components['com.example.Device2.firmware'].invalidate()
+    appstream.gzindex.write(store2, '/tmp/indexed2.xml.gz')
+    assert os.path.getsize('/tmp/indexed2.xml.gz') == os.path.getsize('/tmp/indexed.xml.gz')
+    shutil.copyfile('/tmp/indexed2.xml.gz', '/tmp/indexed.xml.gz')
+    try:
+        appstream.IndexedStore('/tmp/indexed.xml.gz')
+        assert False
+    except appstream.ParseError:
+        pass
+    os.remove('/tmp/indexed2.xml.gz')
+    os.remove('/tmp/indexed2.xml.gz.idx')
+
+    # saving without an index removes an old one
+    store2.to_file('/tmp/indexed.xml.gz')
+    assert not os.path.exists('/tmp/indexed.xml.gz.idx')
+    os.remove('/tmp/indexed.xml.gz')
+
+    # add a directory of metainfo files
+    metainfo_dir = tempfile.mkdtemp()
+    try:
+        for i in range(4):
+            fn = os.path.join(metainfo_dir, 'app%i.metainfo.xml' % i)
+            with open(fn, 'w') as f:
+                f.write('<component><id>app%i</id></component>' % i)
+        with open(os.path.join(metainfo_dir, 'bad.metainfo.xml'), 'w') as f:
+            f.write('junk')
+        with open(os.path.join(metainfo_dir, 'size.metainfo.xml'), 'w') as f:
+            f.write('<component><id>size</id><releases><release version="1">'
+                    '<size type="download">abc</size></release></releases></component>')
+        for workers in [1, 2]:
+            store = appstream.Store()
+            failed = store.from_directory(metainfo_dir, workers=workers)
+            assert len(store.components) == 4, store.components
+            assert sorted(failed) == [os.path.join(metainfo_dir, 'bad.metainfo.xml'),
+                                      os.path.join(metainfo_dir, 'size.metainfo.xml')], failed
+            for error in failed.values():
+                assert isinstance(error, appstream.ParseError), error
+    finally:
+        shutil.rmtree(metainfo_dir)
+
+    # malformed values are parse errors
+    for bad in ['<releases><release version="1"><size type="download">abc</size></release></releases>',
+                '<releases><release timestamp="x"/></releases>',
+                '<releases><release version="0xZZ"/></releases>',
+                '<reviews><review karma="-"/></reviews>',
+                '<screenshots><screenshot><image width="wide">a.png</image></screenshot></screenshots>',
+                '<provides><firmware type="flashed"/></provides>',
+                '<description/>']:
+        xml = '<component><id>bad</id>%s</component>' % bad
+        try:
+            appstream.Component().parse(xml)
+            assert False, bad
+        except appstream.ParseError:
+            pass
+        for backend in ['etree', 'expat']:
+            try:
+                appstream.Store().parse('<components origin="x">%s</components>' % xml, backend=backend)
+                assert False, (bad, backend)
+            except appstream.ParseError:
+                pass
+
+    # content hash and cached XML
+    store = appstream.Store()
+    store.from_file('/tmp/firmware.xml.gz')
+    app = store.get_component('com.hughski.ColorHug.firmware')
+    store2 = appstream.Store()
+    store2.from_file('/tmp/firmware.xml.gz')
+    app2 = store2.get_component('com.hughski.ColorHug.firmware')
+    assert app.get_hash() == app2.get_hash()
+    xml = app.to_xml()
+    assert app.to_xml() is xml
+    csum = appstream.Checksum()
+    csum.value = 'f00f'
+    csum.target = 'signature'
+    app.get_release_latest().add_checksum(csum)
+    assert app.get_hash() != app2.get_hash()
+    assert 'f00f' in app.to_xml()
+    app2 = pickle.loads(pickle.dumps(app, pickle.HIGHEST_PROTOCOL))
+    assert app.get_hash() == app2.get_hash()
+    app2.get_release_latest().add_checksum(appstream.Checksum())
+    assert app.get_hash() != app2.get_hash()
+
+    # protocol 0 is the default on Python 2
+    for obj in [csum, appstream.Review(), appstream.Image(),
+                appstream.Provide(), appstream.Require()]:
+        obj2 = pickle.loads(pickle.dumps(obj, 0))
+        for key in obj.__slots__:
+            assert getattr(obj2, key) == getattr(obj, key), key
+    app2 = pickle.loads(pickle.dumps(app, 0))
+    assert app.get_hash() == app2.get_hash()
+
+    # changing the releases list drops the cached XML and hash
+    app2 = pickle.loads(pickle.dumps(app, pickle.HIGHEST_PROTOCOL))
+    xml = app2.to_xml()
+    rel = app2.releases[0]
+    del app2.releases[0]
+    assert rel._parent is None
+    assert app2.to_xml() != xml and app.get_hash() != app2.get_hash()
+    app2.releases.append(rel)
+    assert rel._parent is app2 and app2.releases[0] is rel
+    assert app.get_hash() == app2.get_hash()
+    old = app2.releases[1]
+    new = appstream.Release()
+    new.version = '9.9'
+    app2.releases[1] = new
+    assert old._parent is None and new._parent is app2
+    assert app2.releases[0] is new and 'version="9.9"' in app2.to_xml()
+    app2.releases.pop(0)
+    app2.releases.append(old)
+    assert app.get_hash() == app2.get_hash()
+
+    # other assignments need invalidate()
+    app2.name = 'Renamed'
+    app2.get_release_latest().description = '<p>New notes</p>'
+    app2.get_release_latest().checksums[0].value = 'bb'
+    app2.screenshots[0].caption = 'New caption'
+    app2.invalidate()
+    xml = app2.to_xml()
+    assert '<name>Renamed</name>' in xml and 'New notes' in xml, xml
+    assert '>bb</checksum>' in xml and 'New caption' in xml, xml
+    assert app.get_hash() != app2.get_hash()
+
+    # validate the whole store
+    store = appstream.Store()
+    store.from_file('/tmp/firmware.xml.gz')
+    app = appstream.Component()
+    app.id = 'com.hughski.Empty'
+    store.add(app)
+    for workers in [1, 2]:
+        report = store.validate_all(workers=workers)
+        assert sorted(report) == ['com.hughski.ColorHug.firmware', 'com.hughski.Empty'], report
+        errors = [str(e) for e in report['com.hughski.ColorHug.firmware']]
+        assert errors == ['No <metadata_license> tag'], errors
+        assert len(report['com.hughski.Empty']) == 6, report
+        assert isinstance(report['com.hughski.Empty'][0], appstream.ValidationError)
+    app.name = 'Empty'
+    app.invalidate()
+    assert len(store.validate_all()['com.hughski.Empty']) == 5
+
+    # merge stores with priorities
+    stable = appstream.Store('stable')
+    app = appstream.Component()
+    app.parse(data)
+    app.name = 'Stable name'
+    app.keywords = ['one']
+    stable.add(app)
+    testing = appstream.Store('testing')
+    app = appstream.Component()
+    app.parse(data)
+    app.name = 'Testing name'
+    app.summary = 'Testing summary'
+    app.keywords = ['one', 'two']
+    rel = appstream.Release()
+    rel.version = '1.2.6'
+    app.add_release(rel)
+    csum = appstream.Checksum()
+    csum.target = 'content'
+    csum.value = 'cafe'
+    app.get_release_by_version('1.2.5').add_checksum(csum)
+    testing.add(app)
+    merged = appstream.store.merge_stores([(stable, 10), (testing, 5)])
+    app = merged.get_component('com.hughski.ColorHug.firmware')
+    assert app.name == 'Stable name', app.name
+    assert app.summary == 'Testing summary', app.summary
+    assert app.keywords == ['one', 'two'], app.keywords
+    assert [rel.version for rel in app.releases] == ['1.2.6', '1.2.5'], app.releases
+    assert len(app.get_release_by_version('1.2.5').checksums) == 1
+    origins = merged.origins[app.id]
+    assert origins['name'] == 'stable', origins
+    assert origins[('keywords', 'two')] == 'testing', origins
+    assert origins[('release', '1.2.6')] == 'testing', origins
+    assert merged.get_release_by_checksum('cafe')[0] is app
+    merged = appstream.store.merge_stores([(stable, 1), (testing, 5)])
+    app = merged.get_component('com.hughski.ColorHug.firmware')
+    assert app.name == 'Testing name', app.name
+    assert stable.get_component(app.id).name == 'Stable name'
+
+    # profile parsing and serializing
+    calls = []
+    parse = appstream.Component.__dict__['parse']
+    fromstring = appstream.etree.fromstring
+    stats = appstream.profiling.Stats(callback=lambda phase, elapsed: calls.append(phase))
+    with appstream.profiling.profile(stats):
+        store = appstream.Store()
+        store.from_file('/tmp/firmware.xml.gz')
+        store.get_component('com.hughski.ColorHug.firmware').invalidate()
+        xml = store.to_xml()
+    assert stats.calls['Store.from_file'] == 1, stats.calls
+    assert stats.calls['Component.parse'] == 1, stats.calls
+    assert stats.calls['Release._parse_tree'] == 2, stats.calls
+    assert stats.calls['Component.to_xml'] == 1, stats.calls
+    assert stats.elements['release'] == 2, stats.elements
+    assert stats.bytes_in == os.path.getsize('/tmp/firmware.xml.gz'), stats.bytes_in
+    assert stats.bytes_out == len(xml), stats.bytes_out
+    assert 'Component.parse' in calls, calls
+    assert 'Component.parse' in stats.report()
+    assert appstream.Component.__dict__['parse'] is parse
+    assert appstream.etree.fromstring is fromstring
+    for backend in ['etree', 'expat']:
+        with appstream.profiling.profile() as stats:
+            store = appstream.Store()
+            for _ in store.iter_file('/tmp/firmware.xml.gz', backend=backend):
+                pass
+        assert stats.calls['Store.iter_file'] == 1, stats.calls
+        assert stats.elements['release'] == 2, (backend, stats.elements)
+        assert stats.calls['_parse_desc'] > 0, (backend, stats.calls)
+        assert stats.bytes_in == os.path.getsize('/tmp/firmware.xml.gz'), stats.bytes_in
+    store = appstream.Store()
+    store.from_file('/tmp/firmware.xml.gz')
+    store.to_file('/tmp/indexed.xml.gz', index=True)
+    with appstream.IndexedStore('/tmp/indexed.xml.gz') as istore:
+        with appstream.profiling.profile() as stats:
+            istore.get_component('com.hughski.ColorHug.firmware')
+    assert stats.calls['IndexedStore.get_component'] == 1, stats.calls
+    assert stats.elements['release'] == 2, stats.elements
+    os.remove('/tmp/indexed.xml.gz')
+    os.remove('/tmp/indexed.xml.gz.idx')
+    cache_dir = tempfile.mkdtemp()
+    try:
+        with appstream.profiling.profile() as stats:
+            appstream.Store().from_file('/tmp/firmware.xml.gz', cache_dir=cache_dir)
+        assert stats.calls['Store.from_file'] == 1, stats.calls
+        assert stats.bytes_in == os.path.getsize('/tmp/firmware.xml.gz'), stats.bytes_in
+    finally:
+        shutil.rmtree(cache_dir)
+
+    # diff and patch
+    old = appstream.Store()
+    old.from_file('/tmp/firmware.xml.gz')
+    new = appstream.Store()
+    new.from_file('/tmp/firmware.xml.gz')
+    delta = old.diff(new)
+    assert delta['added'] == [] and delta['removed'] == [] and delta['changed'] == {}, delta
+    app = new.get_component('com.hughski.ColorHug.firmware')
+    app.name = 'ColorHug Updated'
+    app.releases.remove(app.get_release_by_version('1.2.5'))
+    csum = appstream.Checksum()
+    csum.value = 'f00f'
+    csum.target = 'content'
+    app.get_release_by_version('1.2.4').add_checksum(csum)
+    app2 = appstream.Component()
+    app2.id = 'com.hughski.ColorHug2.firmware'
+    new.add(app2)
+    delta = old.diff(new)
+    assert [c.id for c in delta['added']] == [app2.id], delta
+    change = delta['changed']['com.hughski.ColorHug.firmware']
+    assert change['fields'] == {'name': 'ColorHug Updated'}, change
+    assert change['releases']['removed'] == ['1.2.5'], change
+    old.apply(delta)
+    assert old.diff(new)['changed'] == {}, old.diff(new)
+    app = old.get_component('com.hughski.ColorHug.firmware')
+    assert app.get_release_by_version('1.2.4').get_checksum_by_target('content').value == 'f00f'
+    assert old.get_release_by_checksum('f00f')[0] is app
+    assert old.search('updated') == [app]
+
+    # iterate without adding to the store
+    store = appstream.Store()
+    ids = [c.id for c in store.iter_file('/tmp/firmware.xml.gz')]
+    assert ids == ['com.hughski.ColorHug.firmware'], ids
+    assert len(store.components) == 0, store.components
+    assert len(list(store.iter_components())) == 0
+
+    # the expat backend gives the same components as ElementTree
+    data = """<?xml version="1.0" encoding="UTF-8"?>
+<components version="0.9" origin="test">
+  <component type="firmware">
+    <id>com.hughski.ColorHug.firmware</id>
+    <name>ColorHug &amp; Friends</name>
+    <name xml:lang="fr">ColorHug et amis</name>
+    <summary>
+      Firmware for the
+      ColorHug
+    </summary>
+    <description><p>First</p><ul><li>One</li><li>Two</li></ul></description>
+    <description><q>ignored</q></description>
+    <icon type="remote" width="64">http://example.com/icon.png</icon>
+    <url>http://www.hughski.com/</url>
+    <url type="bugtracker">http://bugs.hughski.com/</url>
+    <kudos><kudo>HiDpiIcon</kudo></kudos>
+    <keywords><keyword>colorimeter</keyword></keywords>
+    <categories><category>X-Device</category></categories>
+    <custom><value key="foo">bar</value></custom>
+    <provides><firmware type="flashed">84F40464-9272-4EF7-9399-CD95F12DA696</firmware></provides>
+    <requires><id compare="ge" version="0.8.0">org.freedesktop.fwupd</id></requires>
+    <releases>
+      <release version="0x10" date="2016-02-25" urgency="high">
+        <checksum target="content" type="sha1" filename="fw.bin">deadbeef</checksum>
+        <size type="download">1234</size>
+        <description>Plain text</description>
+      </release>
+      <release version="1.2.3" timestamp="1400000000"/>
+    </releases>
+    <reviews>
+      <review date="2016-09-15" id="17" rating="80" karma="-1">
+        <summary>Hello world</summary>
+        <description><p>Long</p></description>
+        <version>1.2.3</version>
+        <reviewer_name>Richard</reviewer_name>
+        <lang>en_GB</lang>
+        <metadata><value key="foo">bar</value></metadata>
+      </review>
+    </reviews>
+    <screenshots>
+      <screenshot type="default">
+        <image type="thumbnail" width="624" height="351">http://a.png</image>
+        <caption><p>Caption</p></caption>
+      </screenshot>
+    </screenshots>
+  </component>
+  <component><id>com.hughski.Empty.firmware</id></component>
+</components>
+"""
+    store = appstream.Store()
+    store.parse(data)
+    store2 = appstream.Store()
+    store2.parse(data, backend='expat')
+    assert store2.origin == store.origin == 'test', store2.origin
+    assert sorted(store2.components) == sorted(store.components)
+    for app_id in store.components:
+        app = store.get_component(app_id)
+        app2 = store2.get_component(app_id)
+        assert appstream.utils._canonical(app2) == appstream.utils._canonical(app), app_id
+    app = store2.get_component('com.hughski.ColorHug.firmware')
+    assert app.description == '<p>First</p><ul><li>One</li><li>Two</li></ul>', app.description
+    assert app.get_release_by_version('16').get_checksum_by_target('content').value == 'deadbeef'
+    assert store2.get_components_by_provide('firmware-flashed',
+                                            '84f40464-9272-4ef7-9399-cd95f12da696') == [app]
+    store2 = appstream.Store()
+    store2.from_file('/tmp/firmware.xml.gz', backend='expat')
+    store = appstream.Store()
+    store.from_file('/tmp/firmware.xml.gz')
+    assert store2.origin == store.origin, store2.origin
+    for app_id in store.components:
+        assert store2.get_component(app_id).get_hash() == store.get_component(app_id).get_hash()
+    for xml in ['<components origin="x"><component><description><q>x</q>'
+                '</description></component></components>', '<components>junk']:
+        errors = []
+        for backend in ['etree', 'expat']:
+            try:
+                appstream.Store().parse(xml, backend=backend)
+                assert False
+            except appstream.ParseError as e:
+                errors.append(str(e))
+        if 'junk' not in xml:
+            assert errors[0] == errors[1], errors
+    try:
+        appstream.Store().parse(data, backend='unknown')
+        assert False
+    except ValueError:
+        pass
+
+    # parse only some fields
+    fields = ['provides', 'releases']
+    store = appstream.Store()
+    store.parse(data, fields=fields)
+    store2 = appstream.Store()
+    store2.parse(data, backend='expat', fields=fields)
+    for app_id in store.components:
+        app = store.get_component(app_id)
+        app2 = store2.get_component(app_id)
+        assert appstream.utils._canonical(app2) == appstream.utils._canonical(app), app_id
+    app = store2.get_component('com.hughski.ColorHug.firmware')
+    assert app.kind is None and app.name is None and app.description is None
+    assert app.reviews == [] and app.screenshots == [] and app.custom == {}
+    assert len(app.provides) == 1 and len(app.releases) == 2
+    assert app.get_release_by_version('16').description == '<p>Plain text</p>'
+    assert store2.get_release_by_checksum('deadbeef')[0] is app
+    for backend in ['etree', 'expat']:
+        store = appstream.Store()
+        store.from_file('/tmp/firmware.xml.gz', backend=backend, fields=['releases'])
+        app = store.get_component('com.hughski.ColorHug.firmware')
+        assert len(app.releases) == 2 and app.provides == [], app.provides
+    try:
+        appstream.Store().parse(data, fields=['id', 'unknown'])
+        assert False
+    except ValueError:
+        pass
+
+    # lxml, if installed, gives the same components as the stdlib
+    entities = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE components [<!ENTITY vendor "Vendor">]>
+<components origin="entities">
+  <component><id>entity</id><developer_name>&vendor; Inc</developer_name></component>
+</components>
+"""
+    store = appstream.Store()
+    store.parse(entities, backend='expat')
+    assert store.get_component('entity').developer_name == 'Vendor Inc'
+    with open('/tmp/appstream-secret.txt', 'w') as f:
+        f.write('secret')
+    external = entities.replace('<!ENTITY vendor "Vendor">',
+                                '<!ENTITY vendor SYSTEM "file:///tmp/appstream-secret.txt">')
+    implementation = appstream.etree.name
+    results = {}
+    try:
+        for name in appstream.etree.available():
+            appstream.etree.use(name)
+            store = appstream.Store()
+            store.parse(data)
+            assert store.origin == 'test', store.origin
+            store.parse(entities)
+            app = store.get_component('entity')
+            # lxml older than 5 cannot expand only the internal ones
+            if name == 'stdlib' or appstream.etree._LXML_OPTIONS['resolve_entities']:
+                assert app.developer_name == 'Vendor Inc', (name, app.developer_name)
+            store.from_file('/tmp/firmware.xml.gz')
+            results[name] = dict([(c.id, appstream.utils._canonical(c))
+                                  for c in store.get_components()])
+            try:
+                store.parse('<components origin="x"><component>')
+                assert False
+            except appstream.ParseError:
+                pass
+
+            # external entities are never read
+            for backend in ['etree', 'expat']:
+                store = appstream.Store()
+                try:
+                    store.parse(external, backend=backend)
+                except appstream.ParseError:
+                    continue
+                app = store.get_component('entity')
+                assert 'secret' not in (app.developer_name or ''), (name, backend)
+    finally:
+        appstream.etree.use(implementation)
+        os.remove('/tmp/appstream-secret.txt')
+    for name in results:
+        assert results[name] == results['stdlib'], name
+    try:
+        appstream.etree.use('unknown')
+        assert False
+    except ValueError:
+        pass
+
     # sign
     #from signature import Signature
     #ss = Signature()